@@ -0,0 +1,79 @@
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import dbfile
+
+# ---------------------------
+# Thread-offloaded database access
+# ---------------------------
+# NiceGUI serves every websocket from one asyncio loop, so a blocking query in
+# a page handler stalls all connected clients. These wrappers run the dbfile
+# functions on a dedicated worker pool instead; each worker thread keeps its
+# own pooled connection, so WAL readers proceed in parallel.
+DB_WORKERS = int(os.environ.get('EATY_DB_WORKERS', 8))
+
+_executor = ThreadPoolExecutor(max_workers=DB_WORKERS, thread_name_prefix='eaty-db')
+
+
+async def run_db(func, *args, **kwargs):
+    """Run a blocking dbfile call on the database pool and await its result."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(func, *args, **kwargs))
+
+
+def shutdown():
+    _executor.shutdown(wait=True)
+    dbfile.close_all()
+
+
+# ---------------------------
+# Async CRUD API
+# ---------------------------
+async def init_db():
+    await run_db(dbfile.init_db)
+
+
+async def insert_user(data):
+    return await run_db(dbfile.insert_user, data)
+
+
+async def update_user(user_id, data):
+    await run_db(dbfile.update_user, user_id, data)
+
+
+async def insert_user_with_weight(data):
+    return await run_db(dbfile.insert_user_with_weight, data)
+
+
+async def update_user_with_weight(user_id, data):
+    await run_db(dbfile.update_user_with_weight, user_id, data)
+
+
+async def get_latest_user():
+    return await run_db(dbfile.get_latest_user)
+
+
+async def insert_log(user_id, log_type, content, satisfaction, calories=0):
+    await run_db(dbfile.insert_log, user_id, log_type, content, satisfaction, calories)
+
+
+async def insert_logs_bulk(rows):
+    await run_db(dbfile.insert_logs_bulk, rows)
+
+
+async def get_logs():
+    return await run_db(dbfile.get_logs)
+
+
+async def get_logs_page(user_id, limit=10, after=None, before=None):
+    return await run_db(dbfile.get_logs_page, user_id, limit, after, before)
+
+
+async def insert_weight(user_id, weight):
+    await run_db(dbfile.insert_weight, user_id, weight)
+
+
+async def get_weight_history(user_id):
+    return await run_db(dbfile.get_weight_history, user_id)
@@ -0,0 +1,42 @@
+from sklearn.ensemble import (
+    HistGradientBoostingClassifier,
+    HistGradientBoostingRegressor,
+    RandomForestClassifier,
+    RandomForestRegressor,
+)
+
+# ---------------------------
+# Estimator backends
+# ---------------------------
+# Estimator class and default params per backend and task. Every backend's
+# models can be flattened by compiled_forest.export_model, so the app serves
+# them all through CompiledForest. Which one it serves is picked by the model
+# bundle: models/LATEST, or models/LATEST.<backend> when EATY_MODEL_BACKEND
+# is set (see model_service.model_dir).
+BACKENDS = {
+    'forest': {
+        'calorie': (RandomForestRegressor, dict(n_estimators=200, random_state=42, max_depth=12)),
+        'exercise': (RandomForestClassifier, dict(n_estimators=250, random_state=42, max_depth=14)),
+    },
+    'hgb': {
+        'calorie': (HistGradientBoostingRegressor,
+                    dict(max_iter=300, learning_rate=0.1, max_leaf_nodes=31, random_state=42)),
+        'exercise': (HistGradientBoostingClassifier,
+                     dict(max_iter=200, learning_rate=0.05, max_leaf_nodes=15, random_state=42)),
+    },
+}
+DEFAULT_BACKEND = 'forest'
+
+
+def params(backend, task):
+    return dict(BACKENDS[backend][task][1])
+
+
+def make_estimator(backend, task, n_jobs=-1, **overrides):
+    """Unfitted estimator for `task` ('calorie' or 'exercise')."""
+    estimator_cls, defaults = BACKENDS[backend][task]
+    kwargs = {**defaults, **overrides}
+    # HistGradientBoosting has no n_jobs; it threads through OpenMP instead.
+    if 'n_jobs' in estimator_cls().get_params():
+        kwargs['n_jobs'] = n_jobs
+    return estimator_cls(**kwargs)
@@ -0,0 +1,104 @@
+# backfill_metrics.py
+#
+# Recomputes users.bmi, bmr and body_fat for every user with one of the
+# formula sets in metrics.py, e.g. after a formula changed. Users are read in
+# id order, --chunk-size at a time; each chunk is computed in one vectorized
+# call and only the rows whose stored values differ are written back, with a
+# single executemany.
+#
+# By default every chunk commits together with a checkpoint in job_state
+# ('backfill_user_metrics'), so an interrupted run resumes after the last
+# committed user when started again with the same formulas. With
+# --single-transaction the whole backfill commits at once instead: readers
+# see either the old or the new values, and an interrupted run leaves the
+# table untouched.
+#
+# --formulas is required: it must be the set of the app that owns the
+# database (main.py: mifflin, nicegui_offline_weight_app.py: harris_navy), or
+# the stored values stop matching what that app computes on its own writes.
+#
+#   python backfill_metrics.py --formulas mifflin
+#   python backfill_metrics.py --formulas mifflin --chunk-size 50000 --single-transaction
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+import dbfile
+import metrics
+
+CHECKPOINT_KEY = 'backfill_user_metrics'
+METRIC_COLUMNS = ['bmi', 'bmr', 'body_fat']
+
+
+def changed_rows(chunk, formulas):
+    """(bmi, bmr, body_fat, id) tuples for the users in `chunk` whose values change; NaN becomes NULL."""
+    users = pd.DataFrame.from_records(chunk, columns=dbfile.USER_METRIC_COLUMNS)
+    new = metrics.compute_frame(users, formulas)[METRIC_COLUMNS].to_numpy(dtype=float)
+    old = users[METRIC_COLUMNS].to_numpy(dtype=float)
+    same = np.isclose(old, new) | (np.isnan(old) & np.isnan(new))
+    changed = ~same.all(axis=1)
+    values = pd.DataFrame(new[changed], columns=METRIC_COLUMNS).astype(object)
+    values = values.where(values.notna(), None)
+    values['id'] = users['id'].to_numpy()[changed]
+    return list(values.itertuples(index=False, name=None))
+
+
+def backfill(formulas, chunk_size, single_transaction=False, restart=False):
+    """Run (or resume) the backfill; returns (users scanned, users updated)."""
+    checkpoint = dbfile.get_job_state(CHECKPOINT_KEY)
+    last_id, updated = 0, 0
+    if (checkpoint and not restart and not single_transaction
+            and checkpoint['formulas'] == formulas and not checkpoint['done']):
+        last_id, updated = checkpoint['last_id'], checkpoint['updated']
+        print(f'Resuming after user {last_id} ({updated} updated so far).')
+
+    total = dbfile.count_users_after(last_id)
+    scanned, start = 0, time.perf_counter()
+    try:
+        while True:
+            chunk = dbfile.get_users_after(last_id, chunk_size)
+            if not chunk:
+                break
+            rows = changed_rows(chunk, formulas)
+            last_id = chunk[-1][0]
+            scanned, updated = scanned + len(chunk), updated + len(rows)
+            state = {'formulas': formulas, 'last_id': last_id, 'updated': updated, 'done': False}
+            dbfile.write_user_metrics(rows, checkpoint=None if single_transaction else (CHECKPOINT_KEY, state),
+                                      commit=not single_transaction)
+
+            elapsed = time.perf_counter() - start
+            rate = scanned / elapsed if elapsed else 0.0
+            eta = (total - scanned) / rate if rate else 0.0
+            print(f'  {scanned:>9}/{total} users  {updated:>9} updated  {rate:>9.0f} users/s  ETA {eta:>5.0f}s',
+                  flush=True)
+        if single_transaction:
+            dbfile.get_connection().commit()
+    except BaseException:
+        dbfile.get_connection().rollback()
+        raise
+    dbfile.set_job_state(CHECKPOINT_KEY, {'formulas': formulas, 'last_id': last_id, 'updated': updated,
+                                          'done': True})
+    return scanned, updated
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Recompute BMI, BMR and body fat for all users')
+    parser.add_argument('--formulas', choices=sorted(metrics.FORMULA_SETS), required=True,
+                        help="the app's formula set: mifflin for main.py, harris_navy for the offline app")
+    parser.add_argument('--chunk-size', type=int, default=10000, help='users read and written per batch')
+    parser.add_argument('--single-transaction', action='store_true',
+                        help='commit the whole backfill at once instead of per chunk')
+    parser.add_argument('--restart', action='store_true', help='ignore the checkpoint of an interrupted run')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    scanned, updated = backfill(args.formulas, args.chunk_size, args.single_transaction, args.restart)
+    print(f"✅ {updated} users updated with '{args.formulas}' ({scanned} scanned) "
+          f"in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+# batch_predict.py
+#
+# Scores every row in `users` with the trained joblib models and upserts the
+# results into user_recommendations. Users are streamed in id ranges of
+# --chunk-size; with --workers > 1 the ranges are featurized and predicted in
+# a process pool while the parent writes results back.
+#
+#   python batch_predict.py --chunk-size 5000 --workers 4
+
+import argparse
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import dbfile
+import metrics
+import model_service
+from model_service import CALORIE_FEATURES
+from utils import ACTIVITY_MULTIPLIERS, DEFAULT_ACTIVITY_MULTIPLIER
+
+RECENT_EXERCISE_LOGS = 7
+
+_bundle = None
+
+
+def build_features(users, burn_by_user, sex_classes):
+    """Vectorized 9-column calorie feature matrix for a chunk of users.
+
+    Mirrors model_service.user_features; rows with missing inputs are dropped.
+    Returns (user_ids, X).
+    """
+    height = users['height_cm'].astype(float)
+    weight = users['weight_kg'].astype(float)
+    target = users['target_weight_kg'].astype(float).fillna(weight - 5)
+
+    bmr = users['bmr'].astype(float)
+    multiplier = users['activity_level'].map(ACTIVITY_MULTIPLIERS).fillna(DEFAULT_ACTIVITY_MULTIPLIER)
+    fallback_burn = (bmr * multiplier - bmr).round(2)
+    burn = users['id'].map(burn_by_user).astype(float).round(2).fillna(fallback_burn)
+
+    features = pd.DataFrame({
+        'age': users['age'].astype(float),
+        'sex': users['gender'].map({label: code for code, label in enumerate(sex_classes)}),
+        'height_cm': height,
+        'start_weight_kg': weight,
+        'target_weight_kg': target,
+        'duration_weeks': users['goal_duration_weeks'].astype(float).fillna(12),
+        'start_bmi': users['bmi'].astype(float).fillna(metrics.bmi(weight, height)),
+        'target_bmi': metrics.bmi(target, height),
+        'avg_calorie_burn': burn,
+    })[CALORIE_FEATURES]
+    valid = features.notna().all(axis=1).to_numpy()
+    return users['id'].to_numpy()[valid], features.to_numpy(dtype=np.float64)[valid]
+
+
+def score_range(bounds):
+    """Featurize and predict users with lo <= id < hi; returns result rows."""
+    lo, hi = bounds
+    rows = dbfile.get_users_by_id_range(lo, hi)
+    if not rows:
+        return []
+    users = pd.DataFrame.from_records(rows, columns=dbfile.USER_FEATURE_COLUMNS)
+    burn = dbfile.get_avg_exercise_burn(lo, hi, RECENT_EXERCISE_LOGS)
+    user_ids, X = build_features(users, burn, _bundle['sex_classes'])
+    if not len(user_ids):
+        return []
+
+    intake = np.round(model_service.predict_intake_batch(X, _bundle))
+    X_exercise = np.column_stack([X[:, :-1], intake, X[:, -1]])
+    exercise = model_service.recommend_exercise_batch(X_exercise, _bundle)
+    return list(zip(user_ids.tolist(), intake.tolist(), exercise.tolist()))
+
+
+def load_bundle(n_jobs):
+    global _bundle
+    _bundle = model_service.load_joblib_bundle(n_jobs=n_jobs)
+
+
+def id_ranges(chunk_size):
+    lo, hi = dbfile.get_user_id_bounds()
+    if lo is None:
+        return []
+    return [(start, start + chunk_size) for start in range(lo, hi + 1, chunk_size)]
+
+
+def run(chunk_size, workers):
+    model_files = (model_service.CALORIE_MODEL_FILE, model_service.EXERCISE_MODEL_FILE)
+    try:
+        trained = all(os.path.exists(model_service.model_path(name)) for name in model_files)
+    except FileNotFoundError:
+        trained = False
+    if not trained:
+        raise SystemExit('No trained models found; run the training scripts first.')
+    if workers == 1:
+        load_bundle(n_jobs=-1)   # one process: let the forests use every core
+    ranges = id_ranges(chunk_size)
+    scored = 0
+    start = time.perf_counter()
+
+    if workers > 1:
+        # spawn, not fork: children must not inherit the parent's SQLite connections.
+        pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn'),
+                                   initializer=load_bundle, initargs=(1,))
+        results = pool.map(score_range, ranges)
+    else:
+        pool = None
+        results = map(score_range, ranges)
+
+    try:
+        for done, rows in enumerate(results, 1):
+            dbfile.save_recommendations(rows)
+            scored += len(rows)
+            elapsed = time.perf_counter() - start
+            print(f'  chunk {done}/{len(ranges)}: {scored} users, {scored / elapsed:,.0f} users/sec', flush=True)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    elapsed = time.perf_counter() - start
+    print(f'✅ Scored {scored} users in {elapsed:.2f}s ({scored / max(elapsed, 1e-9):,.0f} users/sec)')
+    return scored
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Score every user with the trained models')
+    parser.add_argument('--chunk-size', type=int, default=5000, help='users per id range')
+    parser.add_argument('--workers', type=int, default=1, help='scoring processes')
+    args = parser.parse_args()
+    run(args.chunk_size, args.workers)
+
+
+if __name__ == '__main__':
+    main()
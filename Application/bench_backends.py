@@ -0,0 +1,62 @@
+# bench_backends.py
+#
+# Compares the estimator backends in backends.py on weight_loss_training_data.csv:
+# for each backend and model, train time on the shared training split,
+# held-out MAE / accuracy, size on disk, load time and single-row / batch
+# predict latency (measured as in tune_models.serving_cost).
+#
+#   python bench_backends.py [--out backends.json]
+
+import argparse
+import json
+import tempfile
+import time
+
+import train_models
+from backends import BACKENDS, make_estimator
+from tune_models import serving_cost
+
+
+def bench(backend, task):
+    X_train, X_test, y_train, y_test = train_models.task_split(task)
+    model = make_estimator(backend, task)
+    start = time.perf_counter()
+    model.fit(X_train, y_train)
+    fit_seconds = time.perf_counter() - start
+    metric = train_models.score(task, y_test, model.predict(X_test))
+    with tempfile.TemporaryDirectory() as workdir:
+        cost = serving_cost(model, X_test, workdir)
+    return {'backend': backend, 'task': task, **metric, 'fit_seconds': round(fit_seconds, 2), **cost}
+
+
+def print_report(results):
+    print(f"{'task':<9} {'backend':<7} {'metric':>14} {'fit s':>6} {'joblib MB':>9} {'cmp MB':>7} "
+          f"{'load ms':>8} {'row ms':>7} {'cmp row':>7} {'batch ms':>8}")
+    for r in results:
+        metric = f"mae={r['mae']:.1f}" if 'mae' in r else f"acc={r['accuracy']:.3f}"
+        print(f"{r['task']:<9} {r['backend']:<7} {metric:>14} {r['fit_seconds']:>6.1f} {r['joblib_mb']:>9.1f} "
+              f"{r['compiled_mb']:>7.1f} {r['joblib_load_ms']:>8.1f} {r['row_ms']:>7.2f} "
+              f"{r['compiled_row_ms']:>7.2f} {r['batch_ms']:>8.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare estimator backends on the training data')
+    parser.add_argument('--backends', nargs='+', choices=sorted(BACKENDS), default=sorted(BACKENDS))
+    parser.add_argument('--out', help='write the results as JSON')
+    args = parser.parse_args()
+
+    train_models.prepare()
+    results = []
+    for task in ('calorie', 'exercise'):
+        for backend in args.backends:
+            print(f'  {task} / {backend} ...', flush=True)
+            results.append(bench(backend, task))
+    print_report(results)
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"✅ Results written to '{args.out}'")
+
+
+if __name__ == '__main__':
+    main()
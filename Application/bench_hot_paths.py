@@ -0,0 +1,256 @@
+# bench_hot_paths.py
+#
+# Micro-benchmarks of the data, metrics and model hot paths, for catching
+# regressions between commits. Database benchmarks run against seeded
+# fixtures, one per --sizes entry: a single user with that many logs and as
+# many weigh-ins, built from --seed and kept under .cache/bench_fixtures so
+# later runs reuse them. Writes go to a copy, so every run starts from the
+# same data.
+#
+# Each benchmark is timed like timeit: the loop count is calibrated to take
+# at least --min-time seconds and the best and median of --repeats loops are
+# kept, per call. Model benchmarks need a trained bundle (train_models.py)
+# and are skipped without one.
+#
+# Results go to --out as JSON; --compare prints the ratio to an earlier
+# results file and exits non-zero when a benchmark got slower than
+# --threshold times its previous median.
+#
+#   python bench_hot_paths.py --out before.json
+#   python bench_hot_paths.py --sizes 1000,10000 --compare before.json
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+
+import numpy as np
+
+import charts
+import dbfile
+import metrics
+import model_service
+import utils
+from migrations import MIGRATIONS, migrate
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+FIXTURES_DIR = os.path.join(HERE, '.cache', 'bench_fixtures')
+FIXTURE_END = np.datetime64('2026-01-01T00:00:00')
+SEED = 42
+USER = {'name': 'Bench', 'age': 35, 'gender': 'Female', 'height_cm': 168.0, 'weight_kg': 80.0,
+        'target_weight_kg': 70.0, 'goal_duration_weeks': 12, 'neck_cm': 34.0, 'waist_cm': 85.0,
+        'hip_cm': 100.0, 'activity_level': 'Medium', 'goal': 'Lose Weight'}
+
+
+# ---------------------------
+# Fixtures
+# ---------------------------
+def build_fixture(path, rows, seed):
+    """One user with `rows` logs (one a minute) and `rows` weigh-ins (one an hour) up to FIXTURE_END."""
+    rng = np.random.default_rng(seed)
+    minutes = FIXTURE_END - np.arange(rows).astype('timedelta64[m]')
+    hours = FIXTURE_END - np.arange(rows).astype('timedelta64[h]')
+    log_type = np.where(rng.random(rows) < 0.3, 'Exercise', 'Meal')
+    logs = zip(log_type.tolist(), np.where(log_type == 'Meal', 'Lunch', 'Cycling').tolist(),
+               rng.integers(1, 11, rows).tolist(), rng.integers(50, 800, rows).tolist(),
+               np.datetime_as_string(minutes, unit='us').tolist())
+    weights = zip(np.round(USER['weight_kg'] - np.arange(rows)[::-1] * 0.001 + rng.normal(0, 0.3, rows), 1).tolist(),
+                  np.datetime_as_string(hours, unit='us').tolist())
+
+    conn = sqlite3.connect(path)
+    migrate(conn)
+    with conn:
+        computed = metrics.compute(USER['weight_kg'], USER['height_cm'], USER['age'], USER['gender'],
+                                   USER['neck_cm'], USER['waist_cm'], USER['hip_cm'])
+        conn.execute(dbfile.INSERT_USER_SQL, (*USER.values(), *computed.values(), str(FIXTURE_END)))
+        conn.executemany(dbfile.INSERT_LOG_SQL, ((1, *log) for log in logs))
+        conn.executemany(dbfile.INSERT_WEIGHT_SQL, ((1, *weight) for weight in weights))
+    conn.close()
+
+
+def fixture(rows, seed):
+    """Path of the fixture for (`rows`, `seed`) at the current schema, built on first use."""
+    os.makedirs(FIXTURES_DIR, exist_ok=True)
+    path = os.path.join(FIXTURES_DIR, f'rows{rows}-seed{seed}-schema{len(MIGRATIONS)}.db')
+    if not os.path.exists(path):
+        start = time.perf_counter()
+        build_fixture(path + '.tmp', rows, seed)
+        os.replace(path + '.tmp', path)
+        print(f'  built fixture {os.path.basename(path)} in {time.perf_counter() - start:.1f}s', flush=True)
+    return path
+
+
+def use_database(path):
+    dbfile.close_all()
+    dbfile.DB_PATH = path
+    dbfile.clear_profile_cache()
+    charts.clear()
+
+
+# ---------------------------
+# Timing
+# ---------------------------
+def measure(fn, min_time, repeats):
+    """{'loops', 'best_us', 'median_us'} per call of `fn`."""
+    fn()   # first-call costs (imports, caches) are not what is being measured
+    timer = timeit.Timer(fn)
+    loops = 1
+    while True:
+        if timer.timeit(loops) >= min_time:
+            break
+        loops *= 10 if loops < 1000 else 2
+    per_call = [t / loops * 1e6 for t in timer.repeat(repeats, loops)]
+    return {'loops': loops, 'best_us': round(min(per_call), 3), 'median_us': round(statistics.median(per_call), 3)}
+
+
+# ---------------------------
+# Benchmarks
+# ---------------------------
+# (name, callable) pairs; database ones run once per fixture size.
+def database_benchmarks():
+    user = dbfile.get_user(1)
+    count = iter(range(10 ** 9))
+
+    def cold_weight_chart():
+        charts.clear()
+        return charts.weight_chart(1)
+
+    return [
+        ('dbfile.get_logs', dbfile.get_logs),
+        ('dbfile.get_weight_history', lambda: dbfile.get_weight_history(1)),
+        ('dbfile.insert_log', lambda: dbfile.insert_log(1, 'Meal', f'bench {next(count)}', 7, 450)),
+        ('utils.calculate_avg_burn', lambda: utils.calculate_avg_burn(user)),
+        ('charts.weight_chart[cold]', cold_weight_chart),
+        ('charts.weight_chart[cached]', lambda: charts.weight_chart(1)),
+    ]
+
+
+def metrics_benchmarks():
+    u = USER
+    return [
+        ('metrics.bmi', lambda: metrics.bmi(u['weight_kg'], u['height_cm'])),
+        ('metrics.bmr', lambda: metrics.bmr(u['weight_kg'], u['height_cm'], u['age'], u['gender'])),
+        ('metrics.body_fat', lambda: metrics.body_fat(u['gender'], age=u['age'], bmi=28.3)),
+        ('metrics.compute', lambda: metrics.compute(u['weight_kg'], u['height_cm'], u['age'], u['gender'],
+                                                    u['neck_cm'], u['waist_cm'], u['hip_cm'])),
+    ]
+
+
+def model_benchmarks():
+    """Load and single-row predict of both joblib models; [] without a trained bundle."""
+    try:
+        bundle = model_service.load_joblib_bundle()
+    except FileNotFoundError:
+        return []
+    bmi, target_bmi = metrics.bmi(USER['weight_kg'], USER['height_cm']), metrics.bmi(USER['target_weight_kg'],
+                                                                                     USER['height_cm'])
+    calorie_row = [[USER['age'], bundle['sex_classes'].index(USER['gender']), USER['height_cm'], USER['weight_kg'],
+                    USER['target_weight_kg'], USER['goal_duration_weeks'], bmi, target_bmi, 300.0]]
+    exercise_row = [calorie_row[0][:-1] + [2000.0, 300.0]]
+    return [
+        ('model_service.load_joblib_bundle', model_service.load_joblib_bundle),
+        ('calorie model predict', lambda: model_service.predict_intake_batch(calorie_row, bundle)),
+        ('exercise model predict', lambda: model_service.recommend_exercise_batch(exercise_row, bundle)),
+    ]
+
+
+def run(sizes, seed, min_time, repeats):
+    results = []
+
+    def record(name, fn, rows=None):
+        result = {'name': name, 'rows': rows, **measure(fn, min_time, repeats)}
+        results.append(result)
+        print(f"{name:<42} {'' if rows is None else rows:>8} {result['loops']:>7} "
+              f"{result['best_us']:>12.1f} {result['median_us']:>12.1f}", flush=True)
+
+    print(f"{'benchmark':<42} {'rows':>8} {'loops':>7} {'best µs':>12} {'median µs':>12}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in sizes:
+            path = os.path.join(tmp, 'bench.db')
+            shutil.copyfile(fixture(rows, seed), path)
+            use_database(path)
+            for name, fn in database_benchmarks():
+                record(name, fn, rows)
+            dbfile.close_all()
+    for name, fn in metrics_benchmarks():
+        record(name, fn)
+    models = model_benchmarks()
+    if not models:
+        print('  (model benchmarks skipped: no trained models, run train_models.py)')
+    for name, fn in models:
+        record(name, fn)
+    return results
+
+
+# ---------------------------
+# Comparing runs
+# ---------------------------
+def _commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=HERE, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, threshold):
+    """Print each benchmark's median against `baseline`; returns the names that regressed."""
+    before = {(r['name'], r['rows']): r for r in baseline['results']}
+    regressed = []
+    print(f"\nvs. {baseline['commit'] or 'baseline'}:")
+    print(f"{'benchmark':<42} {'rows':>8} {'before µs':>12} {'now µs':>12} {'ratio':>7}")
+    for result in results:
+        old = before.get((result['name'], result['rows']))
+        if old is None:
+            continue
+        ratio = result['median_us'] / old['median_us']
+        flag = '  slower' if ratio > threshold else ''
+        if flag:
+            regressed.append(f"{result['name']} ({result['rows']} rows)" if result['rows'] else result['name'])
+        print(f"{result['name']:<42} {'' if result['rows'] is None else result['rows']:>8} "
+              f"{old['median_us']:>12.1f} {result['median_us']:>12.1f} {ratio:>6.2f}x{flag}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Micro-benchmarks of the data, metrics and model hot paths')
+    parser.add_argument('--sizes', default='1000,10000,100000,1000000', help='comma-separated fixture rows')
+    parser.add_argument('--seed', type=int, default=SEED)
+    parser.add_argument('--min-time', type=float, default=0.2, help='seconds each timed loop runs at least')
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--out', help='write the results as JSON')
+    parser.add_argument('--compare', help='earlier results JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=1.2, help='slowdown ratio reported as a regression')
+    args = parser.parse_args()
+
+    results = run([int(n) for n in args.sizes.split(',')], args.seed, args.min_time, args.repeats)
+    report = {
+        'commit': _commit(),
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': sys.version.split()[0],
+        'machine': platform.platform(),
+        'seed': args.seed,
+        'results': results,
+    }
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Results written to '{args.out}'")
+    if args.compare:
+        with open(args.compare) as f:
+            regressed = compare(results, json.load(f), args.threshold)
+        if regressed:
+            sys.exit(f"slower than {args.threshold:.2f}x before: {', '.join(regressed)}")
+        print(f'✅ No benchmark slower than {args.threshold:.2f}x before')
+
+
+if __name__ == '__main__':
+    main()
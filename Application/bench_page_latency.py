@@ -0,0 +1,110 @@
+# bench_page_latency.py
+#
+# Starts main.py against a seeded throw-away database and measures how page
+# latency grows with the number of concurrent clients.
+#
+#   python bench_page_latency.py --clients 1,5,10,25,50 --rows 20000
+
+import argparse
+import asyncio
+import math
+import os
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import httpx
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def seed_database(path, rows):
+    """Create one user with `rows` logs and `rows` weight entries."""
+    from migrations import migrate
+
+    conn = sqlite3.connect(path)
+    migrate(conn)
+    now = datetime.utcnow()
+    conn.execute('''INSERT INTO users (name, age, gender, height_cm, weight_kg, target_weight_kg,
+                                       goal_duration_weeks, neck_cm, waist_cm, hip_cm, activity_level,
+                                       goal, bmi, bmr, body_fat, created_at)
+                    VALUES ('Bench', 35, 'Female', 168, 80, 70, 12, 34, 85, 100, 'Medium',
+                            'Lose Weight', 28.3, 1550, 33.1, ?)''', (now.isoformat(),))
+    conn.executemany(
+        'INSERT INTO logs (user_id, type, content, satisfaction, calories, timestamp) VALUES (1, ?, ?, ?, ?, ?)',
+        ((random.choice(['Meal', 'Exercise']), 'bench', random.randint(1, 10), random.randint(50, 600),
+          (now - timedelta(minutes=i)).isoformat()) for i in range(rows)))
+    conn.executemany(
+        'INSERT INTO weight_progress (user_id, weight, recorded_at) VALUES (1, ?, ?)',
+        ((80 - i * 0.001, (now - timedelta(hours=rows - i)).isoformat()) for i in range(rows)))
+    conn.commit()
+    conn.close()
+
+
+def start_server(db_path, port):
+    env = dict(os.environ, EATY_DB_PATH=db_path, EATY_PORT=str(port))
+    proc = subprocess.Popen([sys.executable, 'main.py'], cwd=HERE, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            httpx.get(f'http://127.0.0.1:{port}/', timeout=5)
+            return proc
+        except httpx.HTTPError:
+            time.sleep(0.25)
+    proc.kill()
+    raise RuntimeError('server did not start')
+
+
+def percentile(values, p):
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+async def run_level(url, clients, requests_per_client):
+    latencies = []
+
+    async def client():
+        async with httpx.AsyncClient(timeout=120) as http:
+            for _ in range(requests_per_client):
+                start = time.perf_counter()
+                response = await http.get(url)
+                response.raise_for_status()
+                latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(clients)))
+    return latencies, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Page latency vs. concurrent clients')
+    parser.add_argument('--clients', default='1,5,10,25,50', help='comma-separated concurrency levels')
+    parser.add_argument('--requests', type=int, default=20, help='requests per client')
+    parser.add_argument('--rows', type=int, default=20000, help='seeded logs / weight rows')
+    parser.add_argument('--path', default='/', help='page to request')
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        seed_database(db_path, args.rows)
+        proc = start_server(db_path, args.port)
+        try:
+            url = f'http://127.0.0.1:{args.port}{args.path}'
+            print(f'{"clients":>8} {"req/s":>8} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8}')
+            for clients in (int(n) for n in args.clients.split(',')):
+                latencies, elapsed = asyncio.run(run_level(url, clients, args.requests))
+                print(f'{clients:>8} {len(latencies) / elapsed:>8.1f} {percentile(latencies, 50):>8.1f} '
+                      f'{percentile(latencies, 95):>8.1f} {percentile(latencies, 99):>8.1f}')
+        finally:
+            proc.terminate()
+            proc.wait(timeout=10)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,172 @@
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+
+import dbfile
+import downsample
+
+# ---------------------------
+# Figure cache
+# ---------------------------
+# Building a plotly figure and converting it for the browser costs far more
+# than the query behind it, so figures are built once and kept as plain
+# dicts, which ui.plotly sends as they are. Each entry remembers the version
+# of the data it was drawn from and is only rebuilt when that moves on.
+# Cached dicts are shared between clients and never modified in place.
+FIGURE_CACHE_SIZE = 256
+
+_figures = OrderedDict()     # key -> (version, figure dict)
+_lock = threading.Lock()
+
+
+def _get(key):
+    with _lock:
+        entry = _figures.get(key)
+        if entry:
+            _figures.move_to_end(key)
+        return entry
+
+
+def _put(key, version, figure):
+    with _lock:
+        _figures[key] = (version, figure)
+        _figures.move_to_end(key)
+        while len(_figures) > FIGURE_CACHE_SIZE:
+            _figures.popitem(last=False)
+
+
+def figure_dict(fig):
+    """JSON-ready dict of a plotly figure, with each trace's x/y as plain lists."""
+    figure = fig.to_plotly_json()
+    for trace, source in zip(figure['data'], fig.data):
+        trace['x'] = np.asarray(source.x).tolist()
+        trace['y'] = np.asarray(source.y).tolist()
+    return figure
+
+
+def cached_figure(key, version, build):
+    """Figure dict for `key`; `build()` only runs when `version` changed.
+
+    `build` returns a plotly figure, or None when there is nothing to plot.
+    """
+    entry = _get(key)
+    if entry and entry[0] == version:
+        return entry[1]
+    figure = build()
+    figure = None if figure is None else figure_dict(figure)
+    _put(key, version, figure)
+    return figure
+
+
+def clear():
+    with _lock:
+        _figures.clear()
+
+
+# ---------------------------
+# Weight chart
+# ---------------------------
+# weight_progress is append-only, so a cached weight chart is current while
+# the user's newest row id (one index seek) is the one it was drawn up to;
+# rows added since are appended to its trace instead of redrawing. Up to
+# MAX_CHART_POINTS weigh-ins are drawn one point each; a longer history is
+# drawn as its mean per day/week/month with a min-max band
+# (downsample.pick_bucket), so the payload stays bounded. A bucketed chart,
+# and one that gets a back-dated weigh-in, is rebuilt on the next render
+# after a write, choosing from the row count which of the two to draw.
+MAX_CHART_POINTS = 500
+WEIGHT_COLOR = '#059669'
+BAND_COLOR = 'rgba(5,150,105,0.15)'
+
+
+def build_weight_figure(days, weights):
+    fig = px.line(pd.DataFrame({'Day': days, 'Weight': weights}), x='Day', y='Weight', markers=True)
+    fig.update_traces(line_color=WEIGHT_COLOR, marker=dict(color=WEIGHT_COLOR, size=8))
+    fig.update_layout(
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        font=dict(color='#1f2937'),
+        height=450,
+        margin=dict(l=40, r=40, t=20, b=40)
+    )
+    return fig
+
+
+@lru_cache(maxsize=1)
+def _weight_template():
+    """The styled, empty weight figure; charts are filled-in copies of it."""
+    return figure_dict(build_weight_figure([], []))
+
+
+def warm_up():
+    """Import plotly and build the figure templates ahead of the first chart."""
+    _weight_template()
+
+
+def weight_figure(days, weights, low=None, high=None):
+    """Weight figure dict; with `low`/`high`, a band between them behind the line."""
+    template = _weight_template()
+    line = {**template['data'][0], 'x': list(days), 'y': list(weights)}
+    if low is None:
+        return {**template, 'data': [line]}
+    band = {'type': 'scatter', 'x': list(days), 'mode': 'lines', 'line': {'width': 0},
+            'showlegend': False, 'hoverinfo': 'skip'}
+    return {**template, 'data': [
+        {**band, 'y': list(high)},
+        {**band, 'y': list(low), 'fill': 'tonexty', 'fillcolor': BAND_COLOR},
+        line,
+    ]}
+
+
+def weight_chart(user_id, max_points=MAX_CHART_POINTS):
+    """Figure dict of a user's weight over time, or None without data."""
+    key = ('weight', user_id)
+    entry = _get(key)
+    (last_id, last_recorded), figure = entry if entry else ((0, ''), None)
+    if figure is not None:
+        if dbfile.get_last_weight_id(user_id) == last_id:
+            return figure
+        appended = _append_weights(figure, user_id, last_id, last_recorded, max_points)
+        if appended:
+            _put(key, *appended)
+            return appended[1]
+
+    # Cold, evicted or stale: the span decides between raw rows and SQL buckets,
+    # so a long history is never loaded into Python.
+    count, first, last, max_id = dbfile.get_weight_span(user_id)
+    if not count:
+        return None
+    if count <= max_points:
+        rows = dbfile.get_weight_entries(user_id)
+        figure = weight_figure([recorded_at[:10] for _, recorded_at, _ in rows],
+                               [weight for _, _, weight in rows])
+        version = (max(row[0] for row in rows), rows[-1][1])   # rows written since the span included
+    else:
+        bucket = downsample.pick_bucket(first, last, max_points)
+        days, means, lows, highs, _ = zip(*dbfile.get_weight_buckets(user_id, bucket))
+        figure = weight_figure(days, [round(mean, 2) for mean in means], lows, highs)
+        version = (max_id, last)
+    _put(key, version, figure)
+    return figure
+
+
+def _append_weights(figure, user_id, last_id, last_recorded, max_points):
+    """(version, figure) with the weigh-ins after `last_id` appended to a raw chart, or None."""
+    if len(figure['data']) != 1:
+        return None
+    rows = dbfile.get_weight_entries_after(user_id, last_id)
+    # New rows come in id order; they extend the line only if that is also time order.
+    in_order = all(a[1] <= b[1] for a, b in zip(rows, rows[1:]))
+    if (rows and in_order and rows[0][1] >= last_recorded
+            and len(figure['data'][0]['x']) + len(rows) <= max_points):
+        line = figure['data'][0]
+        return (rows[-1][0], rows[-1][1]), {**figure, 'data': [{
+            **line,
+            'x': line['x'] + [recorded_at[:10] for _, recorded_at, _ in rows],
+            'y': line['y'] + [weight for _, _, weight in rows],
+        }]}
+    return None
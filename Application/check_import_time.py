@@ -0,0 +1,96 @@
+# check_import_time.py
+#
+# Cold-start budget for main.py. Imports main in a fresh interpreter under
+# `python -X importtime` (importing no longer starts the server), takes the
+# best of --runs, and fails when the import takes longer than --budget-ms or
+# pulls in one of LAZY_MODULES, which main.py loads on first use instead.
+# With --serve it also starts main.py against a throw-away database and
+# times the first successful response to '/'.
+#
+#   python check_import_time.py --budget-ms 2000 --serve
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+LAZY_MODULES = ('numpy', 'pandas', 'plotly.express', 'sklearn', 'joblib')
+IMPORT_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)')
+
+
+def import_profile(env):
+    """({module: (self µs, cumulative µs)}, cumulative µs of main) for one cold import."""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import main'],
+                            cwd=HERE, env=env, capture_output=True, text=True, check=True)
+    modules, total = {}, None
+    for line in result.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if not match:
+            continue
+        own, cumulative, indent, name = match.groups()
+        modules[name] = (int(own), int(cumulative))
+        if name == 'main' and not indent:
+            total = int(cumulative)
+    return modules, total
+
+
+def first_response_ms(env, port):
+    """Milliseconds from starting main.py until '/' answers 200."""
+    start = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, 'main.py'], cwd=HERE, env=dict(env, EATY_PORT=str(port)),
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        deadline = start + 60
+        while time.perf_counter() < deadline:
+            try:
+                if httpx.get(f'http://127.0.0.1:{port}/', timeout=5).status_code == 200:
+                    return (time.perf_counter() - start) * 1000
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.02)
+        raise RuntimeError('server did not start')
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check the cold-start import time of main.py')
+    parser.add_argument('--budget-ms', type=float, default=2000, help='maximum import time of main')
+    parser.add_argument('--runs', type=int, default=3, help='cold imports to take the best of')
+    parser.add_argument('--top', type=int, default=10, help='slowest modules to list')
+    parser.add_argument('--serve', action='store_true', help='also time the first response of a fresh server')
+    parser.add_argument('--port', type=int, default=8093)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, EATY_DB_PATH=os.path.join(tmp, 'startup.db'))
+        runs = [import_profile(env) for _ in range(args.runs)]
+        modules, total = min(runs, key=lambda run: run[1])
+        response_ms = first_response_ms(env, args.port) if args.serve else None
+
+    print(f"import main: {total / 1000:.0f} ms (best of {args.runs}, budget {args.budget_ms:.0f} ms)")
+    for name, (own, cumulative) in sorted(modules.items(), key=lambda item: -item[1][0])[:args.top]:
+        print(f'  {own / 1000:>7.1f} ms self {cumulative / 1000:>8.1f} ms cumulative  {name}')
+    if response_ms is not None:
+        print(f'first response: {response_ms:.0f} ms after launch')
+
+    eager = [name for name in LAZY_MODULES if name in modules]
+    failures = []
+    if total / 1000 > args.budget_ms:
+        failures.append(f'import took {total / 1000:.0f} ms, over the {args.budget_ms:.0f} ms budget')
+    if eager:
+        failures.append(f"imported at startup: {', '.join(eager)}")
+    if failures:
+        sys.exit('; '.join(failures))
+    print('✅ Within the cold-start budget')
+
+
+if __name__ == '__main__':
+    main()
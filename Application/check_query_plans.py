@@ -0,0 +1,25 @@
+# check_query_plans.py
+#
+# Asserts that every hot query in dbfile.HOT_QUERIES is answered from an
+# index (no full table scan, no temp b-tree sort). A thin wrapper around
+# tests/test_query_plans.py, which migrates a fresh temporary database so it
+# never touches fitnessapp.db; a failure shows the offending query plan.
+# Extra arguments go to pytest.
+#
+#   python check_query_plans.py
+#   python check_query_plans.py -v
+
+import os
+import sys
+
+import pytest
+
+TEST = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tests', 'test_query_plans.py')
+
+
+def main():
+    sys.exit(pytest.main([TEST, '-q', *sys.argv[1:]]))
+
+
+if __name__ == '__main__':
+    main()
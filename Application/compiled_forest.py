@@ -0,0 +1,240 @@
+import json
+import os
+
+import numpy as np
+
+# ---------------------------
+# Flattened tree-ensemble format
+# ---------------------------
+# All trees of a fitted forest are concatenated into flat node arrays:
+#
+#   feature.npy      int32    split feature per node (0 on leaves)
+#   threshold.npy    float64  split threshold per node
+#   left.npy         int32    global index of the left child (leaves point to themselves)
+#   right.npy        int32    global index of the right child (leaves point to themselves)
+#   value.npy        float64  leaf output: (n_nodes,) for regressors,
+#                             (n_nodes, n_classes) class probabilities for classifiers
+#   missing_left.npy bool     whether a missing (NaN) input goes to the left child
+#   roots.npy        int32    root node of every tree
+#   meta.json        kind, depth, feature names, classes and any extra metadata
+#
+# HistGradientBoosting models use the same arrays with `value` holding raw leaf
+# scores, plus
+#
+#   tree_output.npy  int32    output column (class) each tree adds to
+#
+# and the baseline score and loss in meta.json. Forest predictions average the
+# leaf values; boosting predictions add them to the baseline and, for
+# classifiers, apply the sigmoid/softmax link. Categorical splits are not
+# exported. Exports written before missing_left.npy existed still load, but
+# reject NaN inputs instead of guessing where they go.
+#
+# Because leaves loop back to themselves, every tree can be walked in lockstep
+# for exactly `depth` steps without per-tree branching, and the arrays can be
+# memory-mapped so several workers share one copy in the page cache.
+ARRAYS = ('feature', 'threshold', 'left', 'right', 'value', 'roots')
+BOOSTING_LOSSES = ('HalfSquaredError', 'AbsoluteError', 'HalfBinomialLoss', 'HalfMultinomialLoss')
+PREDICT_CHUNK_ROWS = 4096
+
+
+def _write(directory, arrays, meta):
+    os.makedirs(directory, exist_ok=True)
+    for name, array in arrays.items():
+        np.save(os.path.join(directory, f'{name}.npy'), array)
+    with open(os.path.join(directory, 'meta.json'), 'w') as f:
+        json.dump(meta, f, indent=2)
+
+
+def export_model(model, directory, feature_names, labels=None, extra=None):
+    """Export a fitted RandomForest or HistGradientBoosting model to `directory`."""
+    if hasattr(model, '_predictors'):
+        export_boosting(model, directory, feature_names, labels, extra)
+    else:
+        export_forest(model, directory, feature_names, labels, extra)
+
+
+def export_forest(model, directory, feature_names, labels=None, extra=None):
+    """Write a fitted RandomForestRegressor/Classifier to `directory`."""
+    trees = [estimator.tree_ for estimator in model.estimators_]
+    counts = np.array([tree.node_count for tree in trees])
+    offsets = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    is_classifier = hasattr(model, 'classes_')
+
+    feature, threshold, left, right, missing_left, value = [], [], [], [], [], []
+    for tree, offset in zip(trees, offsets):
+        nodes = np.arange(tree.node_count) + offset
+        leaf = tree.children_left == -1
+        feature.append(np.where(leaf, 0, tree.feature))
+        threshold.append(tree.threshold)
+        left.append(np.where(leaf, nodes, tree.children_left + offset))
+        right.append(np.where(leaf, nodes, tree.children_right + offset))
+        missing_left.append(tree.missing_go_to_left)
+        if is_classifier:
+            proba = tree.value[:, 0, :]
+            value.append(proba / proba.sum(axis=1, keepdims=True))
+        else:
+            value.append(tree.value[:, 0, 0])
+
+    arrays = {
+        'feature': np.concatenate(feature).astype(np.int32),
+        'threshold': np.concatenate(threshold).astype(np.float64),
+        'left': np.concatenate(left).astype(np.int32),
+        'right': np.concatenate(right).astype(np.int32),
+        'value': np.concatenate(value).astype(np.float64),
+        'missing_left': np.concatenate(missing_left).astype(bool),
+        'roots': offsets.astype(np.int32),
+    }
+    meta = {
+        'kind': 'classifier' if is_classifier else 'regressor',
+        'n_trees': len(trees),
+        'depth': int(max(tree.max_depth for tree in trees)),
+        'feature_names': list(feature_names),
+        'classes': model.classes_.tolist() if is_classifier else None,
+        'labels': list(labels) if labels is not None else None,
+        'extra': extra or {},
+    }
+    _write(directory, arrays, meta)
+
+
+def export_boosting(model, directory, feature_names, labels=None, extra=None):
+    """Write a fitted HistGradientBoostingRegressor/Classifier to `directory`."""
+    loss = type(model._loss).__name__
+    if loss not in BOOSTING_LOSSES:
+        raise ValueError(f'cannot export a model trained with {loss}')
+    trees = [(output, predictor.nodes) for iteration in model._predictors
+             for output, predictor in enumerate(iteration)]
+    if any(nodes['is_categorical'].any() for _, nodes in trees):
+        raise ValueError('cannot export categorical splits')
+    counts = np.array([len(nodes) for _, nodes in trees])
+    offsets = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    is_classifier = hasattr(model, 'classes_')
+
+    feature, threshold, left, right, missing_left, value = [], [], [], [], [], []
+    for (_, tree), offset in zip(trees, offsets):
+        nodes = np.arange(len(tree)) + offset
+        leaf = tree['is_leaf'].astype(bool)
+        feature.append(np.where(leaf, 0, tree['feature_idx']))
+        threshold.append(tree['num_threshold'])
+        left.append(np.where(leaf, nodes, tree['left'] + offset))
+        right.append(np.where(leaf, nodes, tree['right'] + offset))
+        missing_left.append(tree['missing_go_to_left'])
+        value.append(tree['value'])
+
+    arrays = {
+        'feature': np.concatenate(feature).astype(np.int32),
+        'threshold': np.concatenate(threshold).astype(np.float64),
+        'left': np.concatenate(left).astype(np.int32),
+        'right': np.concatenate(right).astype(np.int32),
+        'value': np.concatenate(value).astype(np.float64),
+        'missing_left': np.concatenate(missing_left).astype(bool),
+        'roots': offsets.astype(np.int32),
+        'tree_output': np.array([output for output, _ in trees], dtype=np.int32),
+    }
+    meta = {
+        'kind': 'classifier' if is_classifier else 'regressor',
+        'ensemble': 'boosting',
+        'loss': loss,
+        'baseline': np.ravel(model._baseline_prediction).tolist(),
+        # HistGradientBoosting predicts on float64 inputs
+        'input_dtype': 'float64',
+        'n_trees': len(trees),
+        'depth': int(max(tree['depth'].max() for _, tree in trees)),
+        'feature_names': list(feature_names),
+        'classes': model.classes_.tolist() if is_classifier else None,
+        'labels': list(labels) if labels is not None else None,
+        'extra': extra or {},
+    }
+    _write(directory, arrays, meta)
+
+
+class CompiledForest:
+    """Vectorized, scikit-learn-free predictor for an exported tree ensemble."""
+
+    def __init__(self, directory, mmap=True):
+        mode = 'r' if mmap else None
+        with open(os.path.join(directory, 'meta.json')) as f:
+            self.meta = json.load(f)
+        self.ensemble = self.meta.get('ensemble', 'forest')
+        names = ARRAYS + ('tree_output',) if self.ensemble == 'boosting' else ARRAYS
+        for name in names:
+            setattr(self, name, np.load(os.path.join(directory, f'{name}.npy'), mmap_mode=mode))
+        missing_left = os.path.join(directory, 'missing_left.npy')
+        self.missing_left = np.load(missing_left, mmap_mode=mode) if os.path.exists(missing_left) else None
+        self.depth = self.meta['depth']
+        self.feature_names = self.meta['feature_names']
+        self.classes_ = np.array(self.meta['classes']) if self.meta['classes'] is not None else None
+        self.labels = self.meta['labels']
+        self.input_dtype = np.dtype(self.meta.get('input_dtype', 'float32'))
+        if self.ensemble == 'boosting':
+            self.baseline = np.array(self.meta['baseline'])
+            # one-hot (n_trees, n_outputs): sums each tree's leaf into its output column
+            self._outputs = np.eye(len(self.baseline))[self.tree_output]
+
+    @property
+    def is_classifier(self):
+        return self.meta['kind'] == 'classifier'
+
+    def _leaves(self, X):
+        # scikit-learn compares float32 (forest) / float64 (boosting) inputs
+        # against float64 thresholds.
+        # NaN fails every `<=`, so rows with one take their node's missing-value
+        # branch instead; chunks without any skip that check.
+        missing = bool(np.isnan(X).any())
+        if missing and self.missing_left is None:
+            raise ValueError('this export has no missing-value routing; re-export the model to predict on NaN')
+        rows = np.arange(X.shape[0])[:, None]
+        nodes = np.broadcast_to(self.roots, (X.shape[0], len(self.roots)))
+        for _ in range(self.depth):
+            x = X[rows, self.feature[nodes]]
+            go_left = x <= self.threshold[nodes]
+            if missing:
+                go_left |= np.isnan(x) & self.missing_left[nodes]
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+        return nodes
+
+    def _raw(self, X):
+        """Averaged leaf values (forest) or raw scores (boosting) per row."""
+        X = np.asarray(X, dtype=self.input_dtype)
+        if X.ndim == 1:
+            X = X[None, :]
+        out = []
+        for start in range(0, X.shape[0], PREDICT_CHUNK_ROWS):
+            values = self.value[self._leaves(X[start:start + PREDICT_CHUNK_ROWS])]
+            if self.ensemble == 'boosting':
+                out.append(values @ self._outputs + self.baseline)
+            else:
+                out.append(values.mean(axis=1))
+        return np.concatenate(out)
+
+    def predict_proba(self, X):
+        if not self.is_classifier:
+            raise TypeError('predict_proba is only available for classifiers')
+        raw = self._raw(X)
+        if self.ensemble == 'forest':
+            return raw
+        if self.meta['loss'] == 'HalfBinomialLoss':
+            positive = 1 / (1 + np.exp(-raw[:, 0]))
+            return np.column_stack([1 - positive, positive])
+        exp = np.exp(raw - raw.max(axis=1, keepdims=True))
+        return exp / exp.sum(axis=1, keepdims=True)
+
+    def predict(self, X):
+        if self.is_classifier:
+            return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+        raw = self._raw(X)
+        return raw[:, 0] if self.ensemble == 'boosting' else raw
+
+
+def check_parity(model, compiled, X):
+    """Compare a compiled forest against `model.predict`; returns the max deviation."""
+    expected = model.predict(X)
+    actual = compiled.predict(np.asarray(X))
+    if compiled.is_classifier:
+        mismatches = int(np.sum(expected != actual))
+        if mismatches:
+            raise AssertionError(f'{mismatches} class predictions differ from model.predict')
+        return 0.0
+    deviation = float(np.max(np.abs(expected - actual)))
+    if not np.allclose(expected, actual, rtol=1e-9, atol=1e-6):
+        raise AssertionError(f'predictions differ from model.predict by up to {deviation}')
+    return deviation
@@ -0,0 +1,136 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+# ---------------------------
+# Training data
+# ---------------------------
+DATA_PATH = 'weight_loss_training_data.csv'
+CACHE_DIR = '.cache'
+
+# Explicit compact dtypes instead of pandas' inferred int64/float64/object.
+DTYPES = {
+    'age': 'int16',
+    'sex': 'category',
+    'height_cm': 'float32',
+    'start_weight_kg': 'float32',
+    'target_weight_kg': 'float32',
+    'duration_weeks': 'float32',
+    'start_bmi': 'float32',
+    'target_bmi': 'float32',
+    'avg_calorie_intake': 'int16',
+    'avg_calorie_burn': 'int16',
+    'main_exercise': 'category',
+}
+COLUMNS = list(DTYPES)
+
+HASH_BLOCK_SIZE = 1 << 20
+
+
+# ---------------------------
+# Columnar cache
+# ---------------------------
+# The parsed CSV is stored as one .npy file per column (category columns as
+# int codes plus their labels in manifest.json) and loaded back memory-mapped.
+# The cache is keyed on the CSV's SHA-256; the file's size and mtime are kept
+# alongside so an unchanged CSV is recognised without re-hashing it.
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _cache_dir(path):
+    return os.path.join(os.path.dirname(os.path.abspath(path)), CACHE_DIR,
+                        os.path.splitext(os.path.basename(path))[0])
+
+
+def _read_manifest(directory):
+    try:
+        with open(os.path.join(directory, 'manifest.json')) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def _write_manifest(directory, manifest):
+    tmp = os.path.join(directory, 'manifest.json.tmp')
+    with open(tmp, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, os.path.join(directory, 'manifest.json'))
+
+
+def _cache_is_current(path, manifest):
+    """True if the cached columns were built from the CSV as it is now."""
+    if manifest is None or manifest.get('dtypes') != DTYPES:
+        return False
+    stat = os.stat(path)
+    if (manifest['size'], manifest['mtime_ns']) == (stat.st_size, stat.st_mtime_ns):
+        return True
+    if manifest['size'] != stat.st_size or manifest['sha256'] != file_sha256(path):
+        return False
+    # Same content, new mtime (e.g. a fresh checkout): refresh the stamp.
+    manifest['mtime_ns'] = stat.st_mtime_ns
+    _write_manifest(_cache_dir(path), manifest)
+    return True
+
+
+def build_cache(path=DATA_PATH):
+    """Parse the CSV with explicit dtypes and write the columnar cache."""
+    directory = _cache_dir(path)
+    os.makedirs(directory, exist_ok=True)
+    stat = os.stat(path)
+    sha256 = file_sha256(path)
+    df = pd.read_csv(path, usecols=COLUMNS, dtype=DTYPES)
+
+    categories = {}
+    for column in COLUMNS:
+        series = df[column]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            categories[column] = series.cat.categories.tolist()
+            values = series.cat.codes.to_numpy()
+        else:
+            values = series.to_numpy()
+        np.save(os.path.join(directory, f'{column}.npy'), values)
+
+    _write_manifest(directory, {
+        'source': os.path.basename(path),
+        'sha256': sha256,
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'rows': len(df),
+        'dtypes': DTYPES,
+        'categories': categories,
+    })
+    return df
+
+
+def load_training_data(path=DATA_PATH, columns=None, use_cache=True):
+    """Load the training CSV as a compactly typed DataFrame.
+
+    Only `columns` (default: all) are materialised. The first call after the
+    CSV changes parses it and rebuilds the cache; later calls memory-map the
+    cached columns instead of parsing.
+    """
+    columns = list(columns or COLUMNS)
+    if not use_cache:
+        return pd.read_csv(path, usecols=columns, dtype={c: DTYPES[c] for c in columns})[columns]
+
+    directory = _cache_dir(path)
+    manifest = _read_manifest(directory)
+    if not _cache_is_current(path, manifest):
+        return build_cache(path)[columns]
+
+    data = {}
+    for column in columns:
+        values = np.load(os.path.join(directory, f'{column}.npy'), mmap_mode='r')
+        if column in manifest['categories']:
+            data[column] = pd.Categorical.from_codes(values, manifest['categories'][column])
+        else:
+            data[column] = values
+    return pd.DataFrame(data, columns=columns, copy=False)
@@ -1,56 +1,455 @@
+import json
+import logging
+import os
+import queue
+import random
 import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from contextlib import contextmanager
 from datetime import datetime
 
+from migrations import migrate
+
+# ---------------------------
+# Connection pool
+# ---------------------------
+# Every thread gets its own connection (NiceGUI handlers, executor threads,
+# background jobs), so readers never share a cursor and WAL lets them run
+# alongside a writer instead of queueing behind it.
+DB_PATH = os.environ.get('EATY_DB_PATH', 'fitnessapp.db')
+STATEMENT_CACHE_SIZE = 256   # prepared statements kept per connection
+BUSY_TIMEOUT_S = 5.0
+
+PRAGMAS = (
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',    # safe with WAL, avoids an fsync per commit
+    'PRAGMA cache_size=-16000',     # ~16 MB page cache per connection
+    'PRAGMA temp_store=MEMORY',
+)
+
+_local = threading.local()
+_pool_lock = threading.Lock()
+_connections = []
+_generation = 0
+_schema_ready = False
+_group_commit = None         # GroupCommitQueue, started on first write when enabled
+
+
+def _open_connection():
+    conn = sqlite3.connect(
+        DB_PATH,
+        timeout=BUSY_TIMEOUT_S,
+        check_same_thread=False,
+        cached_statements=STATEMENT_CACHE_SIZE,
+    )
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
+def get_connection():
+    """Return the calling thread's connection, opening it on first use."""
+    global _schema_ready
+    conn = getattr(_local, 'conn', None)
+    if conn is None or _local.generation != _generation:
+        conn = _open_connection()
+        with _pool_lock:
+            _connections.append(conn)
+            if not _schema_ready:
+                migrate(conn)
+                _schema_ready = True
+            _local.generation = _generation
+        _local.conn = conn
+    return conn
+
+
+def close_all():
+    """Close every pooled connection (used on shutdown and in scripts)."""
+    global _generation, _group_commit
+    if _group_commit is not None:
+        _group_commit.close()
+        _group_commit = None
+    with _pool_lock:
+        for conn in _connections:
+            conn.close()
+        _connections.clear()
+        _generation += 1
+
+
+# ---------------------------
+# Query statistics
+# ---------------------------
+# Opt-in timing of every statement run through the helpers below, enabled
+# with EATY_QUERY_STATS: 1 aggregates every statement; a fraction such as
+# 0.01 aggregates that share of them, chosen at random, which keeps the lock
+# and bookkeeping cheap enough to leave on under load. Either way every
+# statement is timed, and one slower than EATY_SLOW_QUERY_MS is logged to the
+# 'eaty.slow_queries' logger, with its EXPLAIN QUERY PLAN the first time.
+# Unset, the helpers run the statement and nothing else.
+_query_stats_rate = os.environ.get('EATY_QUERY_STATS')
+QUERY_SAMPLE_RATE = float(_query_stats_rate) if _query_stats_rate else None   # None: disabled
+SLOW_QUERY_MS = float(os.environ.get('EATY_SLOW_QUERY_MS', 100))
+
+_query_stats = {}            # (sql, executemany) -> [calls, total s, max s, rows]
+_explained = set()           # statements whose plan has been logged
+_stats_lock = threading.Lock()
+_slow_log = logging.getLogger('eaty.slow_queries')
+
+
+def _record(sql, params, seconds, rows, many=False):
+    if seconds * 1000 >= SLOW_QUERY_MS:
+        _log_slow(sql, params, seconds, rows)
+    if QUERY_SAMPLE_RATE < 1 and random.random() >= QUERY_SAMPLE_RATE:
+        return
+    with _stats_lock:
+        stat = _query_stats.get((sql, many))
+        if stat is None:
+            stat = _query_stats[(sql, many)] = [0, 0.0, 0.0, 0]
+        stat[0] += 1
+        stat[1] += seconds
+        stat[2] = max(stat[2], seconds)
+        stat[3] += max(rows, 0)
+
+
+def _log_slow(sql, params, seconds, rows):
+    with _stats_lock:
+        first = sql not in _explained
+        _explained.add(sql)
+    message = f"slow query: {seconds * 1000:.1f} ms, {rows} rows: {' '.join(sql.split())}"
+    if first:
+        try:
+            plan = [row[3] for row in get_connection().execute('EXPLAIN QUERY PLAN ' + sql, params)]
+        except sqlite3.Error as exc:
+            plan = [f'unavailable ({exc})']
+        message += f"\n  plan: {' | '.join(plan) or '(no steps)'}"
+    _slow_log.warning(message)
+
+
+def query_stats():
+    """Aggregated statement timings, slowest total first (see EATY_QUERY_STATS).
+
+    With sampling, `calls`, `total_ms` and `rows` cover the sampled
+    statements only; divide by `sample_rate` to estimate the totals.
+    """
+    with _stats_lock:
+        stats = [(sql, many, *stat) for (sql, many), stat in _query_stats.items()]
+    return {
+        'sample_rate': QUERY_SAMPLE_RATE,
+        'slow_query_ms': SLOW_QUERY_MS,
+        'statements': [{
+            'sql': ' '.join(sql.split()),
+            'executemany': many,
+            'calls': calls,
+            'total_ms': round(total * 1000, 3),
+            'mean_ms': round(total * 1000 / calls, 3),
+            'max_ms': round(longest * 1000, 3),
+            'rows': rows,
+        } for sql, many, calls, total, longest, rows in sorted(stats, key=lambda stat: -stat[3])],
+    }
+
+
+def reset_query_stats():
+    with _stats_lock:
+        _query_stats.clear()
+        _explained.clear()
+
+
+# ---------------------------
+# Query helpers
+# ---------------------------
+# SQL is kept in constant strings so each connection's statement cache
+# hands back the already-prepared statement on every call.
+def _fetchall(sql, params=()):
+    if QUERY_SAMPLE_RATE is None:
+        return get_connection().execute(sql, params).fetchall()
+    start = time.perf_counter()
+    rows = get_connection().execute(sql, params).fetchall()
+    _record(sql, params, time.perf_counter() - start, len(rows))
+    return rows
+
+
+def _fetchone(sql, params=()):
+    if QUERY_SAMPLE_RATE is None:
+        return get_connection().execute(sql, params).fetchone()
+    start = time.perf_counter()
+    row = get_connection().execute(sql, params).fetchone()
+    _record(sql, params, time.perf_counter() - start, int(row is not None))
+    return row
+
+
+def _fetch_dicts(sql, params=()):
+    if QUERY_SAMPLE_RATE is None:
+        return _dicts(get_connection().execute(sql, params))
+    start = time.perf_counter()
+    rows = _dicts(get_connection().execute(sql, params))
+    _record(sql, params, time.perf_counter() - start, len(rows))
+    return rows
+
+
+def _dicts(cur):
+    col_names = [desc[0] for desc in cur.description]
+    return [dict(zip(col_names, row)) for row in cur.fetchall()]
+
+
+def _execute(sql, params=()):
+    """Run a single write statement in its own transaction.
+
+    Inside unit_of_work() the statement joins that transaction instead; with
+    group commit enabled it is committed together with other threads' writes.
+    """
+    if QUERY_SAMPLE_RATE is None:
+        return _write(sql, params)
+    start = time.perf_counter()
+    cur = _write(sql, params)
+    _record(sql, params, time.perf_counter() - start, cur.rowcount)
+    return cur
+
+
+def _write(sql, params):
+    conn = get_connection()
+    if getattr(_local, 'in_unit_of_work', False):
+        return conn.execute(sql, params)
+    if GROUP_COMMIT_MS is not None:
+        return _group_commit_queue().submit(sql, params).result()
+    with conn:
+        cur = conn.execute(sql, params)
+    return cur
+
+
+def _executemany(conn, sql, rows):
+    """conn.executemany, timed like the helpers above; the plan of a slow one uses its first row."""
+    if QUERY_SAMPLE_RATE is None:
+        return conn.executemany(sql, rows)
+    rows = list(rows)
+    start = time.perf_counter()
+    cur = conn.executemany(sql, rows)
+    _record(sql, rows[0] if rows else (), time.perf_counter() - start, cur.rowcount, many=True)
+    return cur
+
+
+# ---------------------------
+# Batched writes
+# ---------------------------
+# A commit, not the insert, is most of a small write's cost, so writes that
+# belong together share one: unit_of_work() groups a caller's own statements,
+# and the group-commit queue (when EATY_GROUP_COMMIT_MS is set) coalesces single
+# writes from concurrent threads. With EATY_GROUP_COMMIT_MS=0 a commit takes
+# whatever queued up while the previous one ran; a larger window also waits
+# that long for more writers, which only pays off when commits are slow
+# (e.g. synchronous=FULL on a real disk).
+_group_commit_ms = os.environ.get('EATY_GROUP_COMMIT_MS')
+GROUP_COMMIT_MS = None if _group_commit_ms is None else float(_group_commit_ms)   # None: disabled
+GROUP_COMMIT_MAX = 256       # statements per group commit
+
+
+@contextmanager
+def unit_of_work():
+    """Run the dbfile writes inside the block in one transaction.
+
+    Commits once on exit and rolls everything back on an exception. Nested
+    blocks join the outermost one. Yields the thread's connection.
+    """
+    conn = get_connection()
+    if getattr(_local, 'in_unit_of_work', False):
+        yield conn
+        return
+    _local.in_unit_of_work = True
+    _local.after_commit = []
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+        except BaseException:
+            conn.rollback()
+            raise
+        conn.commit()
+    finally:
+        _local.in_unit_of_work = False
+        for callback in _local.after_commit:
+            callback()
+
+
+def _after_commit(callback):
+    """Run `callback` once the current write is committed (or rolled back)."""
+    if getattr(_local, 'in_unit_of_work', False):
+        _local.after_commit.append(callback)
+    else:
+        callback()
+
+
+class GroupCommitQueue:
+    """One writer thread committing statements submitted by many threads.
+
+    The writer takes the first waiting statement, collects whatever else
+    arrives within `window_s` (up to `max_batch`) and runs them all in one
+    transaction. If that fails, the batch is replayed one statement per
+    transaction so a bad row only fails its own caller.
+    """
+
+    def __init__(self, window_s, max_batch=GROUP_COMMIT_MAX):
+        self.window_s = window_s
+        self.max_batch = max_batch
+        self.batches = 0
+        self.statements = 0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='eaty-group-commit', daemon=True)
+        self._thread.start()
+
+    def submit(self, sql, params=()):
+        """Queue a write; the Future resolves to its cursor once committed."""
+        future = Future()
+        self._queue.put((sql, params, future))
+        return future
+
+    def close(self):
+        """Commit what is queued and stop the writer."""
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            deadline = time.monotonic() + self.window_s
+            while len(batch) < self.max_batch:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._commit(batch)
+                    return
+                batch.append(item)
+            self._commit(batch)
+
+    def _commit(self, batch):
+        conn = get_connection()
+        self.batches += 1
+        self.statements += len(batch)
+        try:
+            with conn:
+                cursors = [conn.execute(sql, params) for sql, params, _ in batch]
+        except Exception:
+            for sql, params, future in batch:
+                try:
+                    with conn:
+                        future.set_result(conn.execute(sql, params))
+                except Exception as exc:
+                    future.set_exception(exc)
+            return
+        for cursor, (_, _, future) in zip(cursors, batch):
+            future.set_result(cursor)
+
+
+def _group_commit_queue():
+    global _group_commit
+    with _pool_lock:
+        if _group_commit is None:
+            _group_commit = GroupCommitQueue(GROUP_COMMIT_MS / 1000)
+        return _group_commit
+
+
 # ---------------------------
 # Database setup
 # ---------------------------
-conn = sqlite3.connect('fitnessapp.db', check_same_thread=False)
-c = conn.cursor()
-
-# Users table
-c.execute('''CREATE TABLE IF NOT EXISTS users (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    name TEXT,
-    age INTEGER,
-    gender TEXT,
-    height_cm REAL,
-    weight_kg REAL,
-    target_weight_kg REAL,
-    goal_duration_weeks INTEGER DEFAULT 12,
-    neck_cm REAL,
-    waist_cm REAL,
-    hip_cm REAL,
-    activity_level TEXT,
-    goal TEXT,
-    bmi REAL,
-    bmr REAL,
-    body_fat REAL,
-    created_at TEXT
-)''')
-
-# Logs table
-c.execute('''CREATE TABLE IF NOT EXISTS logs (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    user_id INTEGER,
-    type TEXT,
-    content TEXT,
-    satisfaction INTEGER,
-    calories REAL DEFAULT 0,
-    timestamp TEXT
-)''')
-conn.commit()
+def init_db():
+    """Bring the schema up to date; runs once per process on first connect."""
+    get_connection()
+
+
+# ---------------------------
+# User profile cache
+# ---------------------------
+# Every page starts by loading the current profile, so profiles are kept in
+# an LRU keyed by user id, along with which id is the latest. insert_user and
+# update_user invalidate after their commit, and a fill that raced with a
+# write is dropped (the version check), so this process never serves its own
+# stale data. Writes from other processes (backfill_metrics.py) show up
+# within PROFILE_CACHE_TTL_S.
+PROFILE_CACHE_SIZE = int(os.environ.get('EATY_PROFILE_CACHE_SIZE', 1024))
+PROFILE_CACHE_TTL_S = 60.0
+
+LATEST_USER_SQL = 'SELECT * FROM users ORDER BY created_at DESC LIMIT 1'
+USER_BY_ID_SQL = 'SELECT * FROM users WHERE id = ?'
+
+_profiles = OrderedDict()     # user id -> (loaded_at, profile)
+_latest_user_id = None
+_profile_version = 0
+_profile_lock = threading.Lock()
+_profile_stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+
+
+def _cached_profile(user_id=None):
+    """(profile copy or None, cache version) for `user_id`, or for the latest user."""
+    with _profile_lock:
+        entry = _profiles.get(_latest_user_id if user_id is None else user_id)
+        if entry and time.monotonic() - entry[0] < PROFILE_CACHE_TTL_S:
+            _profiles.move_to_end(entry[1]['id'])
+            _profile_stats['hits'] += 1
+            return dict(entry[1]), _profile_version
+        _profile_stats['misses'] += 1
+        return None, _profile_version
+
+
+def _store_profile(profile, version, latest=False):
+    global _latest_user_id
+    with _profile_lock:
+        if version != _profile_version:
+            return
+        _profiles[profile['id']] = (time.monotonic(), profile)
+        _profiles.move_to_end(profile['id'])
+        if latest:
+            _latest_user_id = profile['id']
+        while len(_profiles) > PROFILE_CACHE_SIZE:
+            _profiles.popitem(last=False)
+
+
+def invalidate_profile(user_id):
+    """Drop a user's cached profile (and the latest-user pointer, which the write may move)."""
+    global _latest_user_id, _profile_version
+    with _profile_lock:
+        _profiles.pop(user_id, None)
+        _latest_user_id = None
+        _profile_version += 1
+        _profile_stats['invalidations'] += 1
+
+
+def clear_profile_cache():
+    global _latest_user_id, _profile_version
+    with _profile_lock:
+        _profiles.clear()
+        _latest_user_id = None
+        _profile_version += 1
+
+
+def profile_cache_info():
+    with _profile_lock:
+        return {**_profile_stats, 'size': len(_profiles), 'maxsize': PROFILE_CACHE_SIZE}
 
 
 # ---------------------------
 # CRUD helper functions
 # ---------------------------
-def insert_user(data):
-    """Insert a new user and return the user_id."""
-    c.execute('''INSERT INTO users (
-                     name, age, gender, height_cm, weight_kg, target_weight_kg,
-                     goal_duration_weeks, neck_cm, waist_cm, hip_cm, activity_level, goal,
-                     bmi, bmr, body_fat, created_at
-                 ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''', (
+INSERT_USER_SQL = '''INSERT INTO users (
+                         name, age, gender, height_cm, weight_kg, target_weight_kg,
+                         goal_duration_weeks, neck_cm, waist_cm, hip_cm, activity_level, goal,
+                         bmi, bmr, body_fat, created_at
+                     ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)'''
+
+UPDATE_USER_SQL = '''UPDATE users SET
+                         name=?, age=?, gender=?, height_cm=?, weight_kg=?, target_weight_kg=?,
+                         goal_duration_weeks=?, neck_cm=?, waist_cm=?, hip_cm=?,
+                         activity_level=?, goal=?, bmi=?, bmr=?, body_fat=?, created_at=?
+                     WHERE id=?'''
+
+
+def _user_params(data):
+    return (
         data['name'],
         data['age'],
         data['gender'],
@@ -67,72 +466,455 @@ def insert_user(data):
         data['bmr'],
         data['body_fat'],
         datetime.utcnow().isoformat()
-    ))
-    conn.commit()
-    return c.lastrowid
+    )
+
+
+def insert_user(data):
+    """Insert a new user and return the user_id."""
+    user_id = _execute(INSERT_USER_SQL, _user_params(data)).lastrowid
+    _after_commit(lambda: invalidate_profile(user_id))
+    return user_id
 
 
 def update_user(user_id, data):
     """Update an existing user’s data."""
-    c.execute('''UPDATE users SET
-                     name=?, age=?, gender=?, height_cm=?, weight_kg=?, target_weight_kg=?,
-                     goal_duration_weeks=?, neck_cm=?, waist_cm=?, hip_cm=?,
-                     activity_level=?, goal=?, bmi=?, bmr=?, body_fat=?, created_at=?
-                 WHERE id=?''', (
-        data['name'],
-        data['age'],
-        data['gender'],
-        data['height_cm'],
-        data['weight_kg'],
-        data.get('target_weight_kg', data['weight_kg'] - 5),
-        data.get('goal_duration_weeks', 12),
-        data['neck_cm'],
-        data['waist_cm'],
-        data.get('hip_cm'),
-        data['activity_level'],
-        data['goal'],
-        data['bmi'],
-        data['bmr'],
-        data['body_fat'],
-        datetime.utcnow().isoformat(),
-        user_id
-    ))
-    conn.commit()
+    _execute(UPDATE_USER_SQL, _user_params(data) + (user_id,))
+    _after_commit(lambda: invalidate_profile(user_id))
+
+
+def insert_user_with_weight(data):
+    """insert_user plus the user's first weight_progress row, committed together."""
+    with unit_of_work():
+        user_id = insert_user(data)
+        insert_weight(user_id, data['weight_kg'])
+    return user_id
+
+
+def update_user_with_weight(user_id, data):
+    """update_user plus a weight_progress row for the new weight, committed together."""
+    with unit_of_work():
+        update_user(user_id, data)
+        insert_weight(user_id, data['weight_kg'])
+
+
+def get_user(user_id):
+    """Return a user's profile as a dict, or None."""
+    profile, version = _cached_profile(user_id)
+    if profile is None:
+        rows = _fetch_dicts(USER_BY_ID_SQL, (user_id,))
+        if not rows:
+            return None
+        profile = rows[0]
+        _store_profile(profile, version)
+        profile = dict(profile)
+    return profile
+
+
+def get_latest_user():
+    """Return the most recently created/updated user as a dict, or None."""
+    profile, version = _cached_profile()
+    if profile is None:
+        rows = _fetch_dicts(LATEST_USER_SQL)
+        if not rows:
+            return None
+        profile = rows[0]
+        _store_profile(profile, version, latest=True)
+        profile = dict(profile)
+    return profile
+
+
+GET_LOGS_SQL = 'SELECT * FROM logs ORDER BY timestamp DESC'
+
+RECENT_EXERCISE_CALORIES_SQL = '''SELECT calories FROM logs
+                                  WHERE user_id = ? AND type = 'Exercise'
+                                  ORDER BY timestamp DESC
+                                  LIMIT ?'''
+
+LOG_PAGE_COLUMNS = 'id, type, content, satisfaction, calories, timestamp'
+
+LOGS_FIRST_PAGE_SQL = f'''SELECT {LOG_PAGE_COLUMNS} FROM logs
+                          WHERE user_id = ?
+                          ORDER BY timestamp DESC, id DESC LIMIT ?'''
+
+LOGS_OLDER_PAGE_SQL = f'''SELECT {LOG_PAGE_COLUMNS} FROM logs
+                          WHERE user_id = ? AND (timestamp, id) < (?, ?)
+                          ORDER BY timestamp DESC, id DESC LIMIT ?'''
+
+LOGS_NEWER_PAGE_SQL = f'''SELECT {LOG_PAGE_COLUMNS} FROM logs
+                          WHERE user_id = ? AND (timestamp, id) > (?, ?)
+                          ORDER BY timestamp ASC, id ASC LIMIT ?'''
+
+INSERT_LOG_SQL = '''INSERT INTO logs (user_id, type, content, satisfaction, calories, timestamp)
+                    VALUES (?, ?, ?, ?, ?, ?)'''
+
+WEIGHT_HISTORY_SQL = '''SELECT date(recorded_at) as day, weight FROM weight_progress
+                        WHERE user_id = ? ORDER BY recorded_at, id'''
 
 
 def insert_log(user_id, log_type, content, satisfaction, calories=0):
-    c.execute('''INSERT INTO logs (user_id, type, content, satisfaction, calories, timestamp)
-                 VALUES (?, ?, ?, ?, ?, ?)''',
-              (user_id, log_type, content, satisfaction, calories, datetime.utcnow().isoformat()))
-    conn.commit()
+    _execute(INSERT_LOG_SQL, (user_id, log_type, content, satisfaction, calories, datetime.utcnow().isoformat()))
+
+
+def insert_logs_bulk(rows):
+    """Insert (user_id, type, content, satisfaction, calories) rows with a single commit."""
+    timestamp = datetime.utcnow().isoformat()
+    with unit_of_work() as conn:
+        _executemany(conn, INSERT_LOG_SQL, [(*row, timestamp) for row in rows])
 
 
 def get_logs():
-    c.execute('SELECT * FROM logs ORDER BY timestamp DESC')
-    rows = c.fetchall()
-    col_names = [desc[0] for desc in c.description]
-    return [dict(zip(col_names, row)) for row in rows]
+    return _fetch_dicts(GET_LOGS_SQL)
+
+
+def get_logs_page(user_id, limit=10, after=None, before=None):
+    """One page of a user's logs, newest first, using keyset pagination.
+
+    `after` / `before` are (timestamp, id) cursors taken from the last / first
+    row of the page on screen; pass one to step to the older / newer page.
+    Returns (rows, has_more), where has_more tells whether another page exists
+    beyond this one in the direction travelled.
+    """
+    if before is not None:
+        rows = _fetch_dicts(LOGS_NEWER_PAGE_SQL, (user_id, *before, limit + 1))
+        return rows[:limit][::-1], len(rows) > limit
+    if after is not None:
+        rows = _fetch_dicts(LOGS_OLDER_PAGE_SQL, (user_id, *after, limit + 1))
+    else:
+        rows = _fetch_dicts(LOGS_FIRST_PAGE_SQL, (user_id, limit + 1))
+    return rows[:limit], len(rows) > limit
+
+
+def log_cursor(row):
+    """The (timestamp, id) keyset cursor for a row returned by get_logs_page."""
+    return row['timestamp'], row['id']
+
+
+def get_recent_exercise_calories(user_id, limit=7):
+    """Calories of the user's latest `limit` exercise logs, newest first."""
+    rows = _fetchall(RECENT_EXERCISE_CALORIES_SQL, (user_id, limit))
+    return [row[0] for row in rows]
+
+
+def get_user_weight_timeline():
+    return _fetchall('SELECT date(created_at) as day, weight_kg FROM users ORDER BY created_at')
+
+
+def get_users_version():
+    """(user count, latest created_at): changes whenever a user is added or updated."""
+    return tuple(_fetchone('SELECT COUNT(*), MAX(created_at) FROM users'))
+
 
 # ---------------------------
-# Weight progress table
+# Daily rollups
 # ---------------------------
-c.execute('''CREATE TABLE IF NOT EXISTS weight_progress (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    user_id INTEGER,
-    weight REAL,
-    recorded_at TEXT
-)''')
-conn.commit()
+# daily_stats is maintained by triggers on logs (see migrations.py), so these
+# read one row per day (per user) instead of aggregating the logs table.
+DAILY_STATS_USER_SQL = '''SELECT day, meals, exercises, exercise_calories, intake_calories
+                          FROM daily_stats WHERE user_id = ? ORDER BY day'''
+
+DAILY_STATS_ALL_SQL = '''SELECT day, SUM(meals), SUM(exercises), SUM(exercise_calories), SUM(intake_calories)
+                         FROM daily_stats GROUP BY day ORDER BY day'''
+
+
+# Calendar buckets for long histories, labelled by their first day (see
+# downsample.pick_bucket).
+BUCKET_STARTS = {
+    'day': 'date({})',
+    'week': "date({}, 'weekday 0', '-6 days')",
+    'month': "strftime('%Y-%m-01', {})",
+}
+
+DAILY_STATS_BUCKET_SQL = {
+    bucket: f'''SELECT {start.format('day')} AS bucket, SUM(meals), SUM(exercises),
+                      SUM(exercise_calories), SUM(intake_calories)
+               FROM daily_stats {{where}} GROUP BY bucket ORDER BY bucket'''
+    for bucket, start in BUCKET_STARTS.items() if bucket != 'day'
+}
+DAILY_STATS_BUCKET_USER_SQL = {bucket: sql.format(where='WHERE user_id = ?')
+                               for bucket, sql in DAILY_STATS_BUCKET_SQL.items()}
+DAILY_STATS_BUCKET_ALL_SQL = {bucket: sql.format(where='') for bucket, sql in DAILY_STATS_BUCKET_SQL.items()}
+
+DAILY_STATS_SPAN_SQL = 'SELECT MIN(day), MAX(day) FROM daily_stats'
+
+
+def get_daily_stats(user_id=None, bucket='day'):
+    """(day, meals, exercises, exercise_calories, intake_calories) rows, oldest first.
+
+    With no user_id the rows are summed across all users; with bucket 'week'
+    or 'month' they are summed per bucket, labelled by its first day.
+    """
+    if bucket == 'day':
+        if user_id is None:
+            return _fetchall(DAILY_STATS_ALL_SQL)
+        return _fetchall(DAILY_STATS_USER_SQL, (user_id,))
+    if user_id is None:
+        return _fetchall(DAILY_STATS_BUCKET_ALL_SQL[bucket])
+    return _fetchall(DAILY_STATS_BUCKET_USER_SQL[bucket], (user_id,))
+
+
+def get_daily_stats_span():
+    """(first day, last day) with logs, or (None, None)."""
+    return tuple(_fetchone(DAILY_STATS_SPAN_SQL))
+
+
+def get_meals_per_day(user_id=None, bucket='day'):
+    return [(day, meals) for day, meals, _, _, _ in get_daily_stats(user_id, bucket) if meals]
+
+
+def get_exercise_calories_per_day(user_id=None, bucket='day'):
+    return [(day, calories) for day, _, exercises, calories, _ in get_daily_stats(user_id, bucket) if exercises]
+
+
+# ---------------------------
+# Weight progress
+# ---------------------------
+INSERT_WEIGHT_SQL = 'INSERT INTO weight_progress (user_id, weight, recorded_at) VALUES (?, ?, ?)'
 
 
 def insert_weight(user_id, weight):
-    c.execute('''INSERT INTO weight_progress (user_id, weight, recorded_at)
-                 VALUES (?, ?, ?)''', (user_id, weight, datetime.utcnow().isoformat()))
-    conn.commit()
+    _execute(INSERT_WEIGHT_SQL, (user_id, weight, datetime.utcnow().isoformat()))
+
+
+def insert_weights_bulk(rows):
+    """Insert (user_id, weight) rows with a single commit."""
+    timestamp = datetime.utcnow().isoformat()
+    with unit_of_work() as conn:
+        _executemany(conn, INSERT_WEIGHT_SQL, [(*row, timestamp) for row in rows])
 
 
 def get_weight_history(user_id):
-    c.execute('''SELECT date(recorded_at) as day, weight FROM weight_progress
-                 WHERE user_id = ? ORDER BY recorded_at''', (user_id,))
-    rows = c.fetchall()
+    rows = _fetchall(WEIGHT_HISTORY_SQL, (user_id,))
     return [{'Day': row[0], 'Weight': row[1]} for row in rows]
+
+
+WEIGHT_ENTRIES_SQL = '''SELECT id, recorded_at, weight FROM weight_progress
+                          WHERE user_id = ? ORDER BY recorded_at, id'''
+
+WEIGHT_ENTRIES_AFTER_SQL = '''SELECT id, recorded_at, weight FROM weight_progress
+                                WHERE user_id = ? AND id > ? ORDER BY id'''
+
+LAST_WEIGHT_ID_SQL = 'SELECT MAX(id) FROM weight_progress WHERE user_id = ?'
+
+WEIGHT_SPAN_SQL = '''SELECT COUNT(*), MIN(recorded_at), MAX(recorded_at), MAX(id) FROM weight_progress
+                       WHERE user_id = ?'''
+
+WEIGHT_BUCKETS_SQL = {
+    bucket: f'''SELECT {start.format('recorded_at')} AS bucket, AVG(weight), MIN(weight), MAX(weight), COUNT(*)
+               FROM weight_progress WHERE user_id = ? GROUP BY bucket ORDER BY bucket'''
+    for bucket, start in BUCKET_STARTS.items()
+}
+
+
+def get_weight_entries(user_id):
+    """(id, recorded_at, weight) rows of a user's weigh-ins, oldest first."""
+    return _fetchall(WEIGHT_ENTRIES_SQL, (user_id,))
+
+
+def get_weight_entries_after(user_id, after_id):
+    """(id, recorded_at, weight) rows of a user's weigh-ins with id > after_id, in insert order."""
+    return _fetchall(WEIGHT_ENTRIES_AFTER_SQL, (user_id, after_id))
+
+
+def get_last_weight_id(user_id):
+    """Id of a user's newest weigh-in row, or None."""
+    return _fetchone(LAST_WEIGHT_ID_SQL, (user_id,))[0]
+
+
+def get_weight_span(user_id):
+    """(count, first recorded_at, last recorded_at, max id) of a user's weigh-ins."""
+    return tuple(_fetchone(WEIGHT_SPAN_SQL, (user_id,)))
+
+
+def get_weight_buckets(user_id, bucket='week'):
+    """(bucket start, mean, min, max, count) per day/week/month of a user's weigh-ins."""
+    return _fetchall(WEIGHT_BUCKETS_SQL[bucket], (user_id,))
+
+
+# ---------------------------
+# Batch scoring
+# ---------------------------
+USER_FEATURE_COLUMNS = ('id', 'age', 'gender', 'height_cm', 'weight_kg', 'target_weight_kg',
+                        'goal_duration_weeks', 'bmi', 'bmr', 'activity_level')
+
+USERS_ID_RANGE_SQL = f'''SELECT {', '.join(USER_FEATURE_COLUMNS)} FROM users
+                         WHERE id >= ? AND id < ? ORDER BY id'''
+
+AVG_EXERCISE_BURN_SQL = '''SELECT user_id, AVG(calories) FROM (
+                               SELECT user_id, calories,
+                                      ROW_NUMBER() OVER (PARTITION BY user_id ORDER BY timestamp DESC) AS rn
+                               FROM logs
+                               WHERE user_id >= ? AND user_id < ? AND type = 'Exercise'
+                           ) WHERE rn <= ? GROUP BY user_id'''
+
+UPSERT_RECOMMENDATION_SQL = '''INSERT INTO user_recommendations (user_id, calorie_intake, main_exercise, predicted_at)
+                               VALUES (?, ?, ?, ?)
+                               ON CONFLICT (user_id) DO UPDATE SET
+                                   calorie_intake = excluded.calorie_intake,
+                                   main_exercise = excluded.main_exercise,
+                                   predicted_at = excluded.predicted_at'''
+
+
+def get_user_id_bounds():
+    """(min_id, max_id) of the users table, or (None, None) when empty."""
+    return _fetchone('SELECT MIN(id), MAX(id) FROM users')
+
+
+def get_users_by_id_range(lo, hi):
+    """Feature columns of users with lo <= id < hi, as row tuples."""
+    return _fetchall(USERS_ID_RANGE_SQL, (lo, hi))
+
+
+def get_avg_exercise_burn(lo, hi, limit=7):
+    """{user_id: mean calories of the latest `limit` exercise logs} for lo <= user_id < hi."""
+    return dict(_fetchall(AVG_EXERCISE_BURN_SQL, (lo, hi, limit)))
+
+
+def save_recommendations(rows):
+    """Upsert (user_id, calorie_intake, main_exercise) rows in one transaction."""
+    now = datetime.utcnow().isoformat()
+    conn = get_connection()
+    with conn:
+        _executemany(conn, UPSERT_RECOMMENDATION_SQL, ((*row, now) for row in rows))
+
+
+# ---------------------------
+# Job state
+# ---------------------------
+UPSERT_JOB_STATE_SQL = '''INSERT INTO job_state (name, value, updated_at) VALUES (?, ?, ?)
+                          ON CONFLICT (name) DO UPDATE SET
+                              value = excluded.value, updated_at = excluded.updated_at'''
+
+
+def get_job_state(name, default=None):
+    """JSON-decoded checkpoint stored under `name`, or `default`."""
+    row = _fetchone('SELECT value FROM job_state WHERE name = ?', (name,))
+    return json.loads(row[0]) if row else default
+
+
+def set_job_state(name, value):
+    _execute(UPSERT_JOB_STATE_SQL, (name, json.dumps(value), datetime.utcnow().isoformat()))
+
+
+# ---------------------------
+# Metrics backfill
+# ---------------------------
+USER_METRIC_COLUMNS = ('id', 'weight_kg', 'height_cm', 'age', 'gender', 'neck_cm', 'waist_cm', 'hip_cm',
+                       'bmi', 'bmr', 'body_fat')
+
+USERS_AFTER_ID_SQL = f'''SELECT {', '.join(USER_METRIC_COLUMNS)} FROM users
+                          WHERE id > ? ORDER BY id LIMIT ?'''
+
+UPDATE_USER_METRICS_SQL = 'UPDATE users SET bmi = ?, bmr = ?, body_fat = ? WHERE id = ?'
+
+
+def count_users_after(after_id):
+    return _fetchone('SELECT COUNT(*) FROM users WHERE id > ?', (after_id,))[0]
+
+
+def get_users_after(after_id, limit):
+    """Up to `limit` users with id > after_id in id order (USER_METRIC_COLUMNS tuples)."""
+    return _fetchall(USERS_AFTER_ID_SQL, (after_id, limit))
+
+
+def write_user_metrics(rows, checkpoint=None, commit=True):
+    """Apply (bmi, bmr, body_fat, id) rows with one executemany.
+
+    `checkpoint` is a (name, value) job_state entry written in the same
+    transaction. With commit=False the transaction is left open for the
+    caller to commit or roll back.
+    """
+    conn = get_connection()
+    _executemany(conn, UPDATE_USER_METRICS_SQL, rows)
+    if checkpoint:
+        name, value = checkpoint
+        conn.execute(UPSERT_JOB_STATE_SQL, (name, json.dumps(value), datetime.utcnow().isoformat()))
+    if commit:
+        conn.commit()
+
+
+# ---------------------------
+# Training export
+# ---------------------------
+# Live training examples for retrain.py: one row per user in the CSV's
+# feature schema, with intake and burn averaged per logged day from
+# daily_stats. Changed users are found by rowid ranges, so an incremental
+# export costs O(rows added since the watermark).
+TRAINING_EXAMPLE_COLUMNS = ('user_id', 'age', 'sex', 'height_cm', 'start_weight_kg', 'target_weight_kg',
+                            'duration_weeks', 'meal_days', 'avg_calorie_intake', 'avg_calorie_burn',
+                            'main_exercise')
+
+LOG_WATERMARK_SQL = '''SELECT (SELECT COALESCE(MAX(id), 0) FROM logs),
+                               (SELECT COALESCE(MAX(id), 0) FROM weight_progress)'''
+
+CHANGED_USERS_SQL = '''SELECT user_id FROM logs WHERE id > ? AND id <= ? AND user_id IS NOT NULL
+                        UNION
+                        SELECT user_id FROM weight_progress WHERE id > ? AND id <= ? AND user_id IS NOT NULL'''
+
+TRAINING_EXAMPLES_SQL = '''SELECT u.id, u.age, u.gender, u.height_cm,
+                                COALESCE((SELECT w.weight FROM weight_progress w WHERE w.user_id = u.id
+                                          ORDER BY w.recorded_at LIMIT 1), u.weight_kg),
+                                u.target_weight_kg, u.goal_duration_weeks,
+                                s.meal_days, s.intake, s.burn,
+                                (SELECT l.content FROM logs l WHERE l.user_id = u.id AND l.type = 'Exercise'
+                                 GROUP BY l.content ORDER BY COUNT(*) DESC LIMIT 1)
+                            FROM users u
+                            JOIN (SELECT user_id,
+                                         SUM(meals > 0) AS meal_days,
+                                         AVG(CASE WHEN meals > 0 THEN intake_calories END) AS intake,
+                                         AVG(exercise_calories) AS burn
+                                  FROM daily_stats
+                                  WHERE user_id IN (SELECT value FROM json_each(?))
+                                  GROUP BY user_id) s ON s.user_id = u.id
+                            ORDER BY u.id'''
+
+ALL_TRAINING_USERS_SQL = 'SELECT DISTINCT user_id FROM daily_stats'
+
+
+def get_log_watermark():
+    """(max logs.id, max weight_progress.id) right now."""
+    return _fetchone(LOG_WATERMARK_SQL)
+
+
+def get_changed_users(since, until):
+    """Ids of users with logs or weights added between two watermarks."""
+    return [row[0] for row in _fetchall(CHANGED_USERS_SQL, (since[0], until[0], since[1], until[1]))]
+
+
+def get_training_examples(user_ids=None):
+    """Training example rows (TRAINING_EXAMPLE_COLUMNS) for `user_ids` (default: every user with logs)."""
+    if user_ids is None:
+        user_ids = [row[0] for row in _fetchall(ALL_TRAINING_USERS_SQL)]
+    return _fetchall(TRAINING_EXAMPLES_SQL, (json.dumps(list(user_ids)),))
+
+
+# ---------------------------
+# Query plans
+# ---------------------------
+# Queries that run on every page render; each must be served by an index.
+HOT_QUERIES = {
+    'get_latest_user': (LATEST_USER_SQL, ()),
+    'get_logs': (GET_LOGS_SQL, ()),
+    'get_logs_page': (LOGS_OLDER_PAGE_SQL, (1, '9999', 0, 11)),
+    'get_logs_page (newer)': (LOGS_NEWER_PAGE_SQL, (1, '', 0, 11)),
+    'get_recent_exercise_calories': (RECENT_EXERCISE_CALORIES_SQL, (1, 7)),
+    'get_weight_history': (WEIGHT_HISTORY_SQL, (1,)),
+    'get_weight_entries': (WEIGHT_ENTRIES_SQL, (1,)),
+    'get_weight_entries_after': (WEIGHT_ENTRIES_AFTER_SQL, (1, 0)),
+    'get_last_weight_id': (LAST_WEIGHT_ID_SQL, (1,)),
+    'get_daily_stats': (DAILY_STATS_USER_SQL, (1,)),
+}
+
+
+def explain(sql, params=()):
+    """Return the EXPLAIN QUERY PLAN detail lines for a statement."""
+    return [row[3] for row in _fetchall('EXPLAIN QUERY PLAN ' + sql, params)]
+
+
+def uses_index(plan):
+    """True if no step does a full table scan or sorts through a temp b-tree."""
+    for step in plan:
+        if 'TEMP B-TREE' in step:
+            return False
+        if step.startswith('SCAN') and 'INDEX' not in step:
+            return False
+    return True
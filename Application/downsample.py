@@ -0,0 +1,18 @@
+import numpy as np
+
+# ---------------------------
+# Time series downsampling
+# ---------------------------
+# Keeps charts bounded however long a history gets by aggregating into
+# calendar buckets: dbfile's bucketed queries do the work in SQL, and
+# pick_bucket chooses the finest bucket that fits a point budget.
+BUCKET_DAYS = {'day': 1, 'week': 7, 'month': 30.4375}
+
+
+def pick_bucket(first, last, max_points):
+    """Finest of BUCKET_DAYS giving at most `max_points` buckets between two ISO dates/timestamps."""
+    span_days = int((np.datetime64(last[:10]) - np.datetime64(first[:10])).astype(int)) + 1
+    for bucket, days in BUCKET_DAYS.items():
+        if span_days / days <= max_points:
+            return bucket
+    return 'month'
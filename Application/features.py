@@ -0,0 +1,18 @@
+# ---------------------------
+# Model feature schemas
+# ---------------------------
+# Column order the calorie-intake and exercise models were trained on. Kept in
+# a dependency-free module so both the web process and the training code can
+# import it.
+CALORIE_FEATURES = [
+    "age",
+    "sex",
+    "height_cm",
+    "start_weight_kg",
+    "target_weight_kg",
+    "duration_weeks",
+    "start_bmi",
+    "target_bmi",
+    "avg_calorie_burn",
+]
+EXERCISE_FEATURES = CALORIE_FEATURES[:-1] + ["avg_calorie_intake", "avg_calorie_burn"]
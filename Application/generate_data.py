@@ -0,0 +1,229 @@
+# generate_data.py
+#
+# Synthetic data at any scale, for benchmarks and training experiments.
+#
+#   csv  rows drawn from the same distributions as gen.js (the generator
+#        behind weight_loss_training_data.csv), vectorized and written in
+#        chunks to a CSV file or a directory of Parquet parts (needs pyarrow).
+#   db   users built from those rows plus --days of history each: four meal
+#        logs a day following model_service.MEAL_SPLIT, exercise logs as often
+#        as the user's main exercise says, and a weekly weigh-in moving from
+#        the start towards the target weight. Written to EATY_DB_PATH (or --db)
+#        one transaction per chunk of users.
+#
+# The same --seed and --chunk-size always give the same values; db history
+# ends at --end (default: today).
+#
+#   python generate_data.py csv --rows 5000000 --out big.csv
+#   python generate_data.py csv --rows 5000000 --format parquet --out big_parquet
+#   python generate_data.py db --users 10000 --days 180 --db bench.db
+
+import argparse
+import os
+import time
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+
+import dbfile
+import metrics
+from dataset import COLUMNS
+from model_service import MEAL_SPLIT
+
+EXERCISES = ['Gym 3x/week', 'Cycling 4x/week', 'Running 3x/week', 'Swimming 2x/week', 'HIIT 3x/week']
+HEIGHT_MEAN = {True: 175, False: 163}   # by sex: male, female
+HEIGHT_STD = 8
+SEED = 42
+
+MEAL_HOURS = {'Breakfast': 8, 'Lunch': 13, 'Dinner': 19, 'Snacks': 16}
+WEIGH_IN_DAYS = 7
+ACTIVITY_LEVELS = ['Low', 'Medium', 'High']
+
+
+def _js_round(values, decimals=0):
+    """Math.round(x * 10**decimals) / 10**decimals: halves round up, unlike np.round."""
+    scale = 10 ** decimals
+    return np.floor(np.asarray(values) * scale + 0.5) / scale
+
+
+# ---------------------------
+# Training rows
+# ---------------------------
+def training_rows(n, rng):
+    """`n` rows in weight_loss_training_data.csv's columns, drawn as gen.js draws them."""
+    age = rng.integers(18, 71, n)
+    male = rng.random(n) > 0.5
+    height = np.clip(np.where(male, HEIGHT_MEAN[True], HEIGHT_MEAN[False])
+                     + (rng.random(n) - 0.5) * 2 * HEIGHT_STD * 1.5, 150, 200)
+    height_m2 = (height / 100) ** 2
+    start_weight = (22 + rng.random(n) * 13) * height_m2          # BMI 22-35
+    target_weight = start_weight * (1 - (0.05 + rng.random(n) * 0.15))   # lose 5-20%
+    duration = (start_weight - target_weight) * (1.5 + rng.random(n) * 2)   # 1.5-3.5 weeks per kg
+    bmr = np.where(male,
+                   88.362 + 13.397 * start_weight + 4.799 * height - 5.677 * age,
+                   447.593 + 9.247 * start_weight + 3.098 * height - 4.330 * age)
+    return pd.DataFrame({
+        'age': age,
+        'sex': np.where(male, 'Male', 'Female'),
+        'height_cm': _js_round(height, 1),
+        'start_weight_kg': _js_round(start_weight, 1),
+        'target_weight_kg': _js_round(target_weight, 1),
+        'duration_weeks': _js_round(duration, 1),
+        'start_bmi': _js_round(start_weight / height_m2, 1),
+        'target_bmi': _js_round(target_weight / height_m2, 1),
+        'avg_calorie_intake': _js_round(bmr * 1.5 - (300 + rng.random(n) * 400)).astype(int),
+        'avg_calorie_burn': _js_round(150 + rng.random(n) * 500).astype(int),
+        'main_exercise': np.asarray(EXERCISES)[rng.integers(0, len(EXERCISES), n)],
+    }, columns=COLUMNS)
+
+
+def write_training_data(path, rows, chunk_size, seed, fmt='csv'):
+    """Write `rows` training rows to `path` chunk by chunk; yields rows written so far."""
+    rng = np.random.default_rng(seed)
+    if fmt == 'parquet':
+        os.makedirs(path, exist_ok=True)
+    for part, start in enumerate(range(0, rows, chunk_size)):
+        chunk = training_rows(min(chunk_size, rows - start), rng)
+        if fmt == 'parquet':
+            try:
+                chunk.to_parquet(os.path.join(path, f'part-{part:05d}.parquet'), index=False)
+            except ImportError as exc:
+                raise SystemExit(f'Parquet output needs pyarrow: {exc}')
+        else:
+            chunk.to_csv(path, mode='w' if part == 0 else 'a', header=part == 0, index=False)
+        yield start + len(chunk)
+
+
+# ---------------------------
+# App database
+# ---------------------------
+def _timestamps(first_day, day, hour, rng):
+    """ISO timestamps `day` days after `first_day`, at `hour` plus a random number of seconds below an hour."""
+    seconds = (day * 86400 + hour * 3600 + rng.integers(0, 3600, len(day))).astype('timedelta64[s]')
+    return np.datetime_as_string(first_day + seconds, unit='us')
+
+
+def history_frames(profiles, days, end, rng):
+    """(users, logs, weight_progress) frames in insert order for `profiles`.
+
+    Logs and weigh-ins refer to users by position in `profiles` (column 'user').
+    """
+    n = len(profiles)
+    first_day = np.datetime64(end) - np.timedelta64(days - 1, 'D')
+    intake = profiles['avg_calorie_intake'].to_numpy()
+    burn = profiles['avg_calorie_burn'].to_numpy()
+    exercise = profiles['main_exercise'].str.split().str[0].to_numpy()
+    per_week = profiles['main_exercise'].str.extract(r'(\d)x')[0].astype(int).to_numpy()
+
+    # Meals: every day, one log per MEAL_SPLIT entry.
+    logs = []
+    user, day = np.repeat(np.arange(n), days), np.tile(np.arange(days), n)
+    for meal, share in MEAL_SPLIT.items():
+        calories = np.round(intake[user] * share * rng.uniform(0.8, 1.2, len(user)))
+        logs.append(pd.DataFrame({'user': user, 'type': 'Meal', 'content': meal,
+                                  'satisfaction': rng.integers(1, 11, len(user)), 'calories': calories,
+                                  'timestamp': _timestamps(first_day, day, MEAL_HOURS[meal], rng)}))
+    # Exercise on per_week/7 of the days; per-session burn keeps the daily average at avg_calorie_burn.
+    user, day = np.nonzero(rng.random((n, days)) < (per_week / 7)[:, None])
+    logs.append(pd.DataFrame({'user': user, 'type': 'Exercise', 'content': exercise[user],
+                              'satisfaction': rng.integers(1, 11, len(user)),
+                              'calories': np.round(burn[user] * 7 / per_week[user] * rng.uniform(0.8, 1.2, len(user))),
+                              'timestamp': _timestamps(first_day, day, 6 + rng.integers(0, 14, len(user)), rng)}))
+    logs = pd.concat(logs, ignore_index=True).sort_values('timestamp', kind='stable')
+
+    # Weekly weigh-ins, losing linearly until the target is reached.
+    start, target = profiles['start_weight_kg'].to_numpy(), profiles['target_weight_kg'].to_numpy()
+    weeks = profiles['duration_weeks'].to_numpy()
+    day = np.arange(0, days, WEIGH_IN_DAYS)
+    progress = np.minimum(1, day[None, :] / 7 / np.maximum(weeks, 1)[:, None])
+    weight = start[:, None] - (start - target)[:, None] * progress + rng.normal(0, 0.4, (n, len(day)))
+    weight[:, 0] = start
+    weight = np.round(weight, 1)
+    weigh_ins = pd.DataFrame({'user': np.repeat(np.arange(n), len(day)), 'weight': weight.ravel(),
+                              'recorded_at': _timestamps(first_day, np.tile(day, n), 7, rng)})
+
+    # Profiles as the app would have saved them after the last weigh-in.
+    current = weight[:, -1]
+    male = profiles['sex'].to_numpy() == 'Male'
+    bmi = current / (profiles['height_cm'].to_numpy() / 100) ** 2
+    users = pd.DataFrame({
+        'name': 'Synthetic user',
+        'age': profiles['age'],
+        'gender': profiles['sex'],
+        'height_cm': profiles['height_cm'],
+        'weight_kg': current,
+        'target_weight_kg': target,
+        'goal_duration_weeks': np.ceil(weeks).astype(int),
+        'neck_cm': np.round(np.where(male, 38, 33) + rng.normal(0, 1.5, n), 1),
+        'waist_cm': np.round(40 + 1.7 * bmi + np.where(male, 5, -2) + rng.normal(0, 4, n), 1),
+        'hip_cm': np.round(55 + 1.6 * bmi + np.where(male, 0, 8) + rng.normal(0, 3, n), 1),
+        'activity_level': np.asarray(ACTIVITY_LEVELS)[rng.integers(0, len(ACTIVITY_LEVELS), n)],
+        'goal': 'Lose Weight',
+    })
+    users = users.join(metrics.compute_frame(users))
+    users['created_at'] = weigh_ins.groupby('user')['recorded_at'].max().to_numpy()
+
+    return users, logs, weigh_ins
+
+
+def _params(frame):
+    return list(frame.itertuples(index=False, name=None))
+
+
+def populate_db(users, days, chunk_size, seed, end):
+    """Add `users` synthetic users with `days` of history each; yields (users, logs, weights) written."""
+    rng = np.random.default_rng(seed)
+    written = np.zeros(3, dtype=int)
+    for start in range(0, users, chunk_size):
+        profiles = training_rows(min(chunk_size, users - start), rng)
+        user_frame, logs, weigh_ins = history_frames(profiles, days, end, rng)
+        with dbfile.unit_of_work() as conn:
+            # Ids are consecutive within the transaction, so the last one gives them all.
+            conn.executemany(dbfile.INSERT_USER_SQL, _params(user_frame))
+            last_id = conn.execute('SELECT last_insert_rowid()').fetchone()[0]
+            user_ids = np.arange(last_id - len(user_frame) + 1, last_id + 1)
+            conn.executemany(dbfile.INSERT_LOG_SQL, _params(logs.assign(user=user_ids[logs['user']])))
+            conn.executemany(dbfile.INSERT_WEIGHT_SQL, _params(weigh_ins.assign(user=user_ids[weigh_ins['user']])))
+        written += (len(user_frame), len(logs), len(weigh_ins))
+        yield tuple(int(count) for count in written)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate synthetic training rows or app data')
+    commands = parser.add_subparsers(dest='command', required=True)
+    csv = commands.add_parser('csv', help='training rows in the CSV schema')
+    csv.add_argument('--rows', type=int, default=5000)
+    csv.add_argument('--out', default='synthetic_training_data.csv', help='CSV file, or directory for parquet')
+    csv.add_argument('--format', choices=['csv', 'parquet'], default='csv')
+    csv.add_argument('--chunk-size', type=int, default=500000)
+    csv.add_argument('--seed', type=int, default=SEED)
+    db = commands.add_parser('db', help='users with logs and weigh-ins in the app database')
+    db.add_argument('--users', type=int, default=1000)
+    db.add_argument('--days', type=int, default=90, help='days of history per user')
+    db.add_argument('--db', help='database file (default: EATY_DB_PATH or fitnessapp.db)')
+    db.add_argument('--end', type=date.fromisoformat, default=datetime.utcnow().date(),
+                    help='last day of history, YYYY-MM-DD')
+    db.add_argument('--chunk-size', type=int, default=1000, help='users per transaction')
+    db.add_argument('--seed', type=int, default=SEED)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.command == 'csv':
+        for written in write_training_data(args.out, args.rows, args.chunk_size, args.seed, args.format):
+            print(f'  {written:>10}/{args.rows} rows  {written / (time.perf_counter() - start):>9.0f} rows/s',
+                  flush=True)
+        print(f"✅ {args.rows} rows written to '{args.out}' in {time.perf_counter() - start:.1f}s")
+        return
+
+    if args.db:
+        dbfile.DB_PATH = args.db
+    for counts in populate_db(args.users, args.days, args.chunk_size, args.seed, args.end):
+        print(f'  {counts[0]:>8}/{args.users} users  {counts[1]:>10} logs  {counts[2]:>9} weigh-ins  '
+              f'{time.perf_counter() - start:>6.1f}s', flush=True)
+    print(f"✅ {args.users} users with {args.days} days of history added to '{dbfile.DB_PATH}' "
+          f"in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
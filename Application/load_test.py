@@ -0,0 +1,350 @@
+# load_test.py
+#
+# Drives a local main.py with many simulated browsers and reports how far one
+# server instance goes. Each client loads a page over HTTP and then talks to
+# it over socket.io the way NiceGUI's JavaScript does (handshake, then
+# 'event' messages for input changes and button clicks), so page handlers run
+# exactly as they do for a real browser. Scenarios:
+#
+#   /, /add-log, /change-data   page visits; latency is the GET of the HTML
+#   save_log                    fill in /add-log and click "💾 Save Log",
+#                               until the "Log added!" notification arrives
+#   update_weight               enter a weight on / and click "Update",
+#                               until "Weight updated!" arrives
+#   flip                        click "🗒️ Recent Logs" on /, until the logs
+#                               table arrives (includes the page's 0.3 s delay)
+#
+# Every scenario runs on its own at each --clients level for --duration
+# seconds, each client repeating it back to back. Reported per scenario and
+# level: completed iterations per second, p50/p95/p99 latency, errors, and
+# the server process's CPU (utime+stime from /proc/<pid>/stat, in cores) and
+# peak memory (VmRSS from /proc/<pid>/status). The last table lists, per
+# scenario, the most clients served with p95 under --slo-ms. With
+# --query-stats RATE the server runs with EATY_QUERY_STATS=RATE and its
+# costliest SQL statements (from /_stats/queries) are listed at the end.
+#
+#   python load_test.py --clients 1,10,50,100 --duration 20 --out load.json
+
+import argparse
+import asyncio
+import html
+import json
+import os
+import re
+import tempfile
+import time
+import uuid
+
+import httpx
+import socketio
+
+from bench_page_latency import percentile, seed_database, start_server
+
+SOCKET_PATH = '/_nicegui_ws/socket.io'
+ELEMENTS = re.compile(r'parseElements\(String\.raw`(.*?)`\)', re.S)
+CLIENT_ID = re.compile(r"query: \{'client_id': '([0-9a-f-]+)'")
+PAGES = ('/', '/add-log', '/change-data')
+ACTIONS = ('save_log', 'update_weight', 'flip')
+SAMPLE_INTERVAL_S = 0.25
+EVENT_TIMEOUT_S = 60
+TOP_STATEMENTS = 8
+
+
+# ---------------------------
+# Simulated browser
+# ---------------------------
+class PageClient:
+    """One browser tab: the HTML of a loaded page plus its socket.io connection."""
+
+    def __init__(self, base_url, http):
+        self.base_url = base_url
+        self.http = http
+        self.elements = {}
+        self.client_id = None
+        self.sio = None
+        self.messages = asyncio.Queue()
+
+    async def load(self, path):
+        """GET `path` and keep its elements; returns milliseconds to the full HTML."""
+        start = time.perf_counter()
+        response = await self.http.get(self.base_url + path)
+        response.raise_for_status()
+        elapsed = (time.perf_counter() - start) * 1000
+        self.elements = json.loads(html.unescape(ELEMENTS.search(response.text).group(1)))
+        self.client_id = CLIENT_ID.search(response.text).group(1)
+        return elapsed
+
+    async def connect(self):
+        self.sio = socketio.AsyncClient(reconnection=False)
+        for name in ('update', 'notify', 'open'):
+            self.sio.on(name, self._receiver(name))
+        await self.sio.connect(f'{self.base_url}/?client_id={self.client_id}&next_message_id=0',
+                               socketio_path=SOCKET_PATH, transports=['websocket'])
+        ok = await self.sio.call('handshake', {
+            'client_id': self.client_id, 'document_id': str(uuid.uuid4()), 'tab_id': str(uuid.uuid4()),
+            'old_tab_id': None, 'next_message_id': 0,
+        }, timeout=EVENT_TIMEOUT_S)
+        if not ok:
+            raise RuntimeError(f'handshake refused for client {self.client_id}')
+
+    def _receiver(self, name):
+        async def receive(data):
+            self.messages.put_nowait((name, data))
+        return receive
+
+    async def close(self):
+        if self.sio is not None:
+            await self.sio.disconnect()
+
+    def find(self, label):
+        """(id, element) of the element labelled `label`: a button, field, or plain text."""
+        for element_id, element in self.elements.items():
+            if label in (element.get('text'), element.get('props', {}).get('label')):
+                return int(element_id), element
+        raise LookupError(f'no element labelled {label!r}')
+
+    async def _emit(self, element_id, element, event_type, *args):
+        listener = next(event for event in element['events'] if event['type'] == event_type)
+        await self.sio.emit('event', {'id': element_id, 'client_id': self.client_id,
+                                      'listener_id': listener['listener_id'],
+                                      'args': [json.dumps(arg) for arg in args]})
+
+    async def fill(self, label, value):
+        """Set the field labelled `label` to `value`, as typing or picking an option does."""
+        element_id, element = self.find(label)
+        options = element.get('props', {}).get('options')
+        if options is not None:
+            value = next(option for option in options if option['label'] == value)
+        types = {event['type'] for event in element['events']}
+        await self._emit(element_id, element, 'update:modelValue' if 'update:modelValue' in types
+                         else 'update:value', value)
+
+    async def click(self, label):
+        element_id, element = self.find(label)
+        await self._emit(element_id, element, 'click')
+
+    async def wait_for(self, name, predicate):
+        """Wait for the first `name` message matching `predicate`."""
+        async def wait():
+            while True:
+                message, data = await self.messages.get()
+                if message == name and predicate(data):
+                    return data
+        return await asyncio.wait_for(wait(), EVENT_TIMEOUT_S)
+
+    def drain(self):
+        while not self.messages.empty():
+            self.messages.get_nowait()
+
+
+# ---------------------------
+# Scenarios
+# ---------------------------
+# Each runs one iteration on a fresh tab and returns its latency in ms.
+def _shows_text(text):
+    return lambda update: any(element and element.get('text') == text for element in update.values())
+
+
+def _notification(text):
+    return lambda notify: notify.get('message') == text
+
+
+async def visit(tab, path):
+    elapsed = await tab.load(path)
+    await tab.connect()
+    return elapsed
+
+
+async def save_log(tab):
+    await visit(tab, '/add-log')
+    await tab.fill('Log Type', 'Meal')
+    await tab.fill('Description', 'Load test meal')
+    await tab.fill('Satisfaction (1-10)', 7)
+    await tab.fill('Calories (optional)', 450)
+    tab.drain()
+    start = time.perf_counter()
+    await tab.click('💾 Save Log')
+    await tab.wait_for('notify', _notification('Log added!'))
+    return (time.perf_counter() - start) * 1000
+
+
+async def update_weight(tab):
+    await visit(tab, '/')
+    await tab.fill('Current weight (kg)', 79.5)
+    tab.drain()
+    start = time.perf_counter()
+    await tab.click('Update')
+    await tab.wait_for('notify', _notification('Weight updated!'))
+    return (time.perf_counter() - start) * 1000
+
+
+async def flip(tab):
+    await visit(tab, '/')
+    tab.drain()
+    start = time.perf_counter()
+    await tab.click('🗒️ Recent Logs')
+    await tab.wait_for('update', _shows_text('🗒️ Recent Logs'))
+    return (time.perf_counter() - start) * 1000
+
+
+SCENARIOS = {
+    **{path: (lambda tab, path=path: visit(tab, path)) for path in PAGES},
+    'save_log': save_log,
+    'update_weight': update_weight,
+    'flip': flip,
+}
+
+
+# ---------------------------
+# Server resources
+# ---------------------------
+def cpu_seconds(pid):
+    """User plus system CPU time of a process so far."""
+    with open(f'/proc/{pid}/stat') as f:
+        fields = f.read().rsplit(')', 1)[1].split()
+    # utime and stime are fields 14 and 15 of the file, counted from the pid.
+    return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+
+
+def rss_mb(pid):
+    with open(f'/proc/{pid}/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+async def sample_rss(pid, peak):
+    while True:
+        peak[0] = max(peak[0], rss_mb(pid))
+        await asyncio.sleep(SAMPLE_INTERVAL_S)
+
+
+# ---------------------------
+# Load levels
+# ---------------------------
+async def run_level(base_url, scenario, clients, duration, pid):
+    """Run `scenario` with `clients` concurrent clients for `duration` seconds; returns a result dict."""
+    run = SCENARIOS[scenario]
+    latencies, errors = [], []
+    deadline = time.perf_counter() + duration
+
+    async def client():
+        async with httpx.AsyncClient(timeout=EVENT_TIMEOUT_S) as http:
+            while time.perf_counter() < deadline:
+                tab = PageClient(base_url, http)
+                try:
+                    latencies.append(await run(tab))
+                except Exception as exc:
+                    errors.append(f'{type(exc).__name__}: {exc}')
+                finally:
+                    await tab.close()
+
+    peak = [rss_mb(pid)]
+    sampler = asyncio.create_task(sample_rss(pid, peak))
+    cpu_start, start = cpu_seconds(pid), time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(clients)))
+    elapsed, cpu = time.perf_counter() - start, cpu_seconds(pid) - cpu_start
+    sampler.cancel()
+    peak[0] = max(peak[0], rss_mb(pid))
+
+    return {
+        'scenario': scenario,
+        'clients': clients,
+        'completed': len(latencies),
+        'errors': len(errors),
+        'first_error': errors[0] if errors else None,
+        'per_second': len(latencies) / elapsed,
+        'p50_ms': percentile(latencies, 50) if latencies else None,
+        'p95_ms': percentile(latencies, 95) if latencies else None,
+        'p99_ms': percentile(latencies, 99) if latencies else None,
+        'cpu_cores': cpu / elapsed,
+        'cpu_ms_per_op': cpu * 1000 / len(latencies) if latencies else None,
+        'rss_peak_mb': peak[0],
+    }
+
+
+def _ms(value):
+    return f'{value:>8.1f}' if value is not None else f'{"-":>8}'
+
+
+def print_result(result):
+    print(f"{result['scenario']:>14} {result['clients']:>7} {result['per_second']:>8.1f} "
+          f"{_ms(result['p50_ms'])} {_ms(result['p95_ms'])} {_ms(result['p99_ms'])} {result['errors']:>6} "
+          f"{result['cpu_cores']:>6.2f} {_ms(result['cpu_ms_per_op'])} {result['rss_peak_mb']:>8.1f}", flush=True)
+    if result['first_error']:
+        print(f"{'':>14} first error: {result['first_error']}")
+
+
+def client_limits(results, slo_ms):
+    """{scenario: most clients with p95 under `slo_ms` and no errors, or 0}."""
+    limits = {}
+    for result in results:
+        ok = result['p95_ms'] is not None and result['p95_ms'] <= slo_ms and not result['errors']
+        limits.setdefault(result['scenario'], 0)
+        if ok:
+            limits[result['scenario']] = max(limits[result['scenario']], result['clients'])
+    return limits
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the NiceGUI pages with simulated browsers')
+    parser.add_argument('--clients', default='1,10,25,50', help='comma-separated concurrency levels')
+    parser.add_argument('--duration', type=float, default=10, help='seconds per scenario and level')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS),
+                        help=f"comma-separated subset of {', '.join(SCENARIOS)}")
+    parser.add_argument('--rows', type=int, default=20000, help='seeded logs / weight rows')
+    parser.add_argument('--slo-ms', type=float, default=500, help='p95 latency a level must stay under')
+    parser.add_argument('--port', type=int, default=8766)
+    parser.add_argument('--query-stats', type=float, metavar='RATE',
+                        help='have the server time its SQL (EATY_QUERY_STATS) and list the costliest statements')
+    parser.add_argument('--out', help='also write the results to this JSON file')
+    args = parser.parse_args()
+
+    scenarios = args.scenarios.split(',')
+    unknown = [name for name in scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)}")
+    levels = [int(n) for n in args.clients.split(',')]
+
+    if args.query_stats:
+        os.environ['EATY_QUERY_STATS'] = str(args.query_stats)
+    results, statements = [], None
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'load.db')
+        seed_database(db_path, args.rows)
+        proc = start_server(db_path, args.port)
+        try:
+            base_url = f'http://127.0.0.1:{args.port}'
+            print(f'{"scenario":>14} {"clients":>7} {"ops/s":>8} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} '
+                  f'{"errors":>6} {"cores":>6} {"cpu ms/op":>8} {"rss MB":>8}')
+            for scenario in scenarios:
+                for clients in levels:
+                    result = asyncio.run(run_level(base_url, scenario, clients, args.duration, proc.pid))
+                    results.append(result)
+                    print_result(result)
+            if args.query_stats:
+                statements = httpx.get(f'{base_url}/_stats/queries', timeout=30).json()['statements']
+        finally:
+            proc.terminate()
+            proc.wait(timeout=10)
+
+    print(f'\nClients per instance with p95 under {args.slo_ms:.0f} ms and no errors:')
+    for scenario, limit in client_limits(results, args.slo_ms).items():
+        print(f'{scenario:>14} {limit if limit else f"< {levels[0]}":>7}'
+              f'{"+" if limit == max(levels) else ""}')
+    if statements:
+        print(f'\nCostliest statements (sample rate {args.query_stats:g}):')
+        print(f'{"calls":>8} {"total ms":>10} {"mean ms":>8} {"max ms":>8} {"rows":>9}  sql')
+        for stat in statements[:TOP_STATEMENTS]:
+            print(f"{stat['calls']:>8} {stat['total_ms']:>10.1f} {stat['mean_ms']:>8.2f} {stat['max_ms']:>8.1f} "
+                  f"{stat['rows']:>9}  {stat['sql'][:80]}")
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump({'duration_s': args.duration, 'rows': args.rows, 'slo_ms': args.slo_ms,
+                       'results': results, 'statements': statements}, f, indent=2)
+    print(f'✅ {len(results)} load levels measured' + (f", written to '{args.out}'" if args.out else ''))
+
+
+if __name__ == '__main__':
+    main()
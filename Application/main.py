@@ -1,45 +1,46 @@
-from nicegui import ui
-import pandas as pd
-import sqlite3
+from nicegui import ui, app
+from fastapi import HTTPException, Request
+import asyncio
+import os
 from datetime import datetime
-from dbfile import insert_user, update_user, insert_log, get_logs, insert_weight, get_weight_history
-import plotly.express as px
+from async_dbfile import (insert_user_with_weight, update_user_with_weight, insert_log, get_logs_page,
+                          get_latest_user, init_db, run_db, shutdown as shutdown_db)
+from dbfile import QUERY_SAMPLE_RATE, log_cursor, query_stats
+
 
 # ----------------------------------------
-# Database
+# Lazy imports
 # ----------------------------------------
-conn = sqlite3.connect('fitnessapp.db', check_same_thread=False)
-c = conn.cursor()
+# NumPy, pandas and plotly (behind metrics.py and charts.py) take longer to
+# import than NiceGUI itself, so they are loaded on first use, or by
+# warm_up() once the server is listening, instead of delaying startup.
+# check_import_time.py keeps them out of the import path.
+def compute_metrics(*args, **kwargs):
+    from metrics import compute
+    return compute(*args, **kwargs)
 
 
-def get_latest_user():
-    c.execute('SELECT * FROM users ORDER BY created_at DESC LIMIT 1')
-    row = c.fetchone()
-    if not row:
-        return None
-    col_names = [desc[0] for desc in c.description]
-    return dict(zip(col_names, row))
+def weight_chart(user_id):
+    from charts import weight_chart
+    return weight_chart(user_id)
 
 
-# ----------------------------------------
-# Calculations
-# ----------------------------------------
-def calculate_bmi(weight, height):
-    return round(weight / ((height / 100) ** 2), 2)
+def warm_up():
+    import charts
+    import metrics
+    charts.warm_up()
 
 
-def calculate_bmr(weight, height, age, gender):
-    if gender.lower() == 'male':
-        return round(10 * weight + 6.25 * height - 5 * age + 5, 2)
-    else:
-        return round(10 * weight + 6.25 * height - 5 * age - 161, 2)
+async def start_warm_up():
+    # Not awaited: startup finishes and the server starts listening meanwhile.
+    asyncio.get_running_loop().run_in_executor(None, warm_up)
 
 
-def calculate_body_fat(bmi, age, gender):
-    if gender.lower() == 'male':
-        return round(1.20 * bmi + 0.23 * age - 16.2, 2)
-    else:
-        return round(1.20 * bmi + 0.23 * age - 5.4, 2)
+# ----------------------------------------
+# Calculations
+# ----------------------------------------
+# BMI, BMR and body fat as this app has always shown them (see metrics.py).
+FORMULAS = 'mifflin'
 
 
 # ----------------------------------------
@@ -66,14 +67,59 @@ def navbar():
         ui.button("My Data", on_click=lambda: ui.navigate.to('/change-data')).classes('mx-2 text-white hover:bg-emerald-700 rounded-lg px-4 py-2')
 
 
+# ----------------------------------------
+# Recent Logs (server-side, keyset-paginated)
+# ----------------------------------------
+LOGS_PAGE_SIZE = 10
+LOG_COLUMNS = [
+    {'name': c, 'label': c.replace("_", " ").title(), 'field': c, 'align': 'left'}
+    for c in ('timestamp', 'type', 'content', 'satisfaction', 'calories')
+]
+
+
+def format_log(row):
+    return {**row, 'timestamp': row['timestamp'][:16].replace('T', ' ')}
+
+
+async def recent_logs_table(user_id):
+    """Log table that only ever holds the page on screen; Newer/Older seek by cursor."""
+    rows, has_older = await get_logs_page(user_id, LOGS_PAGE_SIZE)
+    if not rows:
+        ui.label("No logs yet.").classes('text-gray-500 italic')
+        return
+
+    page = {'rows': rows, 'has_older': has_older, 'has_newer': False}
+    table = ui.table(columns=LOG_COLUMNS, rows=[], row_key='id', pagination=0) \
+        .props('hide-pagination').classes('w-full')
+    with ui.row().classes('w-full justify-between mt-2'):
+        newer_btn = ui.button("◀ Newer", on_click=lambda: show(before=log_cursor(page['rows'][0]))).props('flat')
+        older_btn = ui.button("Older ▶", on_click=lambda: show(after=log_cursor(page['rows'][-1]))).props('flat')
+
+    def refresh():
+        table.rows = [format_log(r) for r in page['rows']]
+        newer_btn.set_enabled(page['has_newer'])
+        older_btn.set_enabled(page['has_older'])
+
+    async def show(after=None, before=None):
+        rows, has_more = await get_logs_page(user_id, LOGS_PAGE_SIZE, after=after, before=before)
+        if not rows:
+            return
+        page['rows'] = rows
+        page['has_older'] = has_more if after is not None else True
+        page['has_newer'] = has_more if before is not None else True
+        refresh()
+
+    refresh()
+
+
 # ----------------------------------------
 # Home Page
 # ----------------------------------------
 @ui.page('/')
-def home():
+async def home():
     ui.query('body').classes(PAGE_BG)
     navbar()
-    user = get_latest_user()
+    user = await get_latest_user()
 
     if not user:
         with ui.column().classes('items-center mt-20'):
@@ -119,19 +165,13 @@ def home():
                     ui.label("📉 Update Weight").classes(SECTION_TITLE)
                     new_w = ui.number("Current weight (kg)").classes('w-full')
 
-                    def update_weight():
+                    async def update_weight():
                         if new_w.value:
-                            insert_weight(user_id, float(new_w.value))
-                            bmi = calculate_bmi(new_w.value, user['height_cm'])
-                            bmr = calculate_bmr(new_w.value, user['height_cm'], user['age'], user['gender'])
-                            body_fat = calculate_body_fat(bmi, user['age'], user['gender'])
-
-                            update_user(user_id, {
+                            await update_user_with_weight(user_id, {
                                 **user,
-                                'weight_kg': new_w.value,
-                                'bmi': bmi,
-                                'bmr': bmr,
-                                'body_fat': body_fat
+                                'weight_kg': float(new_w.value),
+                                **compute_metrics(new_w.value, user['height_cm'], user['age'], user['gender'],
+                                                  formulas=FORMULAS),
                             })
 
                             ui.notify("Weight updated!", type='positive')
@@ -166,42 +206,20 @@ def home():
                     'transition: all 0.6s ease; transform-style: preserve-3d;'
                 )
                 
-                def render_content():
+                async def render_content():
+                    if view_state['current'] == 'chart':
+                        figure = await run_db(weight_chart, user_id)
                     content_container.clear()
                     with content_container:
                         if view_state['current'] == 'chart':
                             ui.label("📈 Weight Over Time").classes(SECTION_TITLE)
-                            history = get_weight_history(user_id)
-                            if history:
-                                df = pd.DataFrame(history)
-                                fig = px.line(df, x='Day', y='Weight', markers=True)
-                                fig.update_traces(line_color='#059669', marker=dict(color='#059669', size=8))
-                                fig.update_layout(
-                                    plot_bgcolor='rgba(0,0,0,0)',
-                                    paper_bgcolor='rgba(0,0,0,0)',
-                                    font=dict(color='#1f2937'),
-                                    height=450,
-                                    margin=dict(l=40, r=40, t=20, b=40)
-                                )
-                                ui.plotly(fig).classes('w-full')
+                            if figure:
+                                ui.plotly(figure).classes('w-full')
                             else:
                                 ui.label("No weight data available yet.").classes('text-gray-500 italic')
                         else:
                             ui.label("🗒️ Recent Logs").classes(SECTION_TITLE)
-                            logs = get_logs()
-                            if logs:
-                                df = pd.DataFrame(logs)
-                                df['timestamp'] = pd.to_datetime(df['timestamp']).dt.strftime('%Y-%m-%d %H:%M')
-                                ui.table(
-                                    columns=[
-                                        {'name': c, 'label': c.replace("_", " ").title(), 'field': c}
-                                        for c in df.columns
-                                    ],
-                                    rows=df.to_dict('records'),
-                                    pagination=10
-                                ).classes('w-full')
-                            else:
-                                ui.label("No logs yet.").classes('text-gray-500 italic')
+                            await recent_logs_table(user_id)
                 
                 def switch_view(view):
                     if view_state['current'] != view:
@@ -217,12 +235,14 @@ def home():
                         
                         # Animate flip
                         content_container.style('opacity: 0; transform: rotateY(90deg);')
-                        ui.timer(0.3, lambda: [
-                            render_content(),
+
+                        async def flip_in():
+                            await render_content()
                             content_container.style('opacity: 1; transform: rotateY(0deg);')
-                        ], once=True)
+
+                        ui.timer(0.3, flip_in, once=True)
                 
-                render_content()
+                await render_content()
 
 # ----------------------------------------
 # Add User Page
@@ -266,11 +286,7 @@ def new_user():
                     ui.label('• Body measurements help track progress').classes('text-sm text-gray-500')
                     ui.label('• Activity level affects calorie recommendations').classes('text-sm text-gray-500')
 
-        def submit():
-            bmi = calculate_bmi(weight.value, height.value)
-            bmr = calculate_bmr(weight.value, height.value, age.value, gender.value)
-            body_fat = calculate_body_fat(bmi, age.value, gender.value)
-
+        async def submit():
             data = {
                 'name': name.value,
                 'age': age.value,
@@ -282,13 +298,10 @@ def new_user():
                 'hip_cm': hip.value,
                 'activity_level': activity.value,
                 'goal': goal.value,
-                'bmi': bmi,
-                'bmr': bmr,
-                'body_fat': body_fat,
+                **compute_metrics(weight.value, height.value, age.value, gender.value, formulas=FORMULAS),
             }
 
-            user_id = insert_user(data)
-            insert_weight(user_id, data['weight_kg'])
+            await insert_user_with_weight(data)
             ui.notify("User added!", type='positive')
             ui.navigate.to('/')
 
@@ -300,10 +313,10 @@ def new_user():
 # Change Data Page
 # ----------------------------------------
 @ui.page('/change-data')
-def change_data():
+async def change_data():
     ui.query('body').classes(PAGE_BG)
     navbar()
-    user = get_latest_user()
+    user = await get_latest_user()
 
     if not user:
         with ui.column().classes('items-center mt-20'):
@@ -341,12 +354,8 @@ def change_data():
                     ui.label('⚠️ Important').classes(SECTION_TITLE)
                     ui.label('Update your information carefully. Weight changes are recorded automatically.').classes('text-gray-600')
 
-        def save():
-            bmi = calculate_bmi(weight.value, height.value)
-            bmr = calculate_bmr(weight.value, height.value, age.value, gender.value)
-            body_fat = calculate_body_fat(bmi, age.value, gender.value)
-
-            update_user(user['id'], {
+        async def save():
+            await update_user_with_weight(user['id'], {
                 'name': name.value,
                 'age': age.value,
                 'gender': gender.value,
@@ -357,12 +366,8 @@ def change_data():
                 'hip_cm': hip.value,
                 'activity_level': activity.value,
                 'goal': goal.value,
-                'bmi': bmi,
-                'bmr': bmr,
-                'body_fat': body_fat
+                **compute_metrics(weight.value, height.value, age.value, gender.value, formulas=FORMULAS),
             })
-
-            insert_weight(user['id'], weight.value)
             ui.notify("Changes saved!", type='positive')
             ui.navigate.to('/')
 
@@ -374,10 +379,10 @@ def change_data():
 # Add Log Page
 # ----------------------------------------
 @ui.page('/add-log')
-def add_log():
+async def add_log():
     ui.query('body').classes(PAGE_BG)
     navbar()
-    user = get_latest_user()
+    user = await get_latest_user()
 
     if not user:
         with ui.column().classes('items-center mt-20'):
@@ -393,8 +398,8 @@ def add_log():
             satisfaction = ui.number("Satisfaction (1-10)").classes('w-full')
             calories = ui.number("Calories (optional)").classes('w-full')
 
-            def save_log():
-                insert_log(user['id'], log_type.value, content.value, satisfaction.value, calories.value or 0)
+            async def save_log():
+                await insert_log(user['id'], log_type.value, content.value, satisfaction.value, calories.value or 0)
                 ui.notify("Log added!", type='positive')
                 ui.navigate.to('/')
 
@@ -402,4 +407,24 @@ def add_log():
 
 
 # ----------------------------------------
-ui.run(title='Eaty – Personal Fitness Companion', reload=False)
\ No newline at end of file
+# Query statistics (only with EATY_QUERY_STATS set)
+# ----------------------------------------
+# The stats include raw SQL, so they are only served to clients on this
+# machine, such as load_test.py.
+LOOPBACK_HOSTS = ('127.0.0.1', '::1')
+
+if QUERY_SAMPLE_RATE is not None:
+    @app.get('/_stats/queries')
+    def get_query_stats(request: Request):
+        if request.client is None or request.client.host not in LOOPBACK_HOSTS:
+            raise HTTPException(status_code=403)
+        return query_stats()
+
+
+# ----------------------------------------
+app.on_startup(init_db)
+app.on_startup(start_warm_up)
+app.on_shutdown(shutdown_db)
+
+if __name__ in {'__main__', '__mp_main__'}:
+    ui.run(title='Eaty – Personal Fitness Companion', reload=False, port=int(os.environ.get('EATY_PORT', 8080)))
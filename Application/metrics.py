@@ -0,0 +1,124 @@
+import numpy as np
+import pandas as pd
+
+# ---------------------------
+# Health metrics
+# ---------------------------
+# BMI, BMR and body fat for a single user or a whole table at once: every
+# argument may be a scalar, a NumPy array or a pandas Series. Results come
+# back as a float for scalar input, a Series (with the input's index) when
+# any argument is a Series, and an array otherwise. Missing values give NaN.
+#
+# The apps have always used different formulas, so they are kept as named
+# sets:
+#   'mifflin'      main.py        Mifflin-St Jeor BMR, Deurenberg body fat
+#   'mifflin_whr'  utils/pages    Mifflin-St Jeor BMR, Deurenberg adjusted by waist-hip ratio
+#   'harris_navy'  offline app    Harris-Benedict BMR, US Navy body fat (neck/waist/hip)
+FORMULA_SETS = {
+    'mifflin': {'bmr': 'mifflin', 'body_fat': 'deurenberg'},
+    'mifflin_whr': {'bmr': 'mifflin', 'body_fat': 'deurenberg_whr'},
+    'harris_navy': {'bmr': 'harris_benedict', 'body_fat': 'navy'},
+}
+DEFAULT_FORMULAS = 'mifflin_whr'
+DECIMALS = 2
+
+
+def _array(value):
+    return np.asarray(value, dtype=float)
+
+
+def _is_male(gender):
+    if isinstance(gender, str):
+        return gender.lower() == 'male'
+    # Compare the few distinct labels, not every row.
+    codes, labels = pd.factorize(np.ravel(np.asarray(gender, dtype=object)))
+    male = np.array([str(label).lower() == 'male' for label in labels] + [False])
+    return male[codes].reshape(np.shape(gender))
+
+
+def _result(values, *inputs):
+    """Round and return `values` in the form of the inputs (see above)."""
+    values = np.round(values, DECIMALS)
+    for value in inputs:
+        if isinstance(value, pd.Series):
+            return pd.Series(np.broadcast_to(values, len(value)), index=value.index)
+    if np.ndim(values) == 0:
+        return float(values)
+    return values
+
+
+# ---------------------------
+# Formulas
+# ---------------------------
+def bmi(weight_kg, height_cm):
+    """Body mass index (kg/m²)."""
+    return _result(_array(weight_kg) / (_array(height_cm) / 100) ** 2, weight_kg, height_cm)
+
+
+def bmr(weight_kg, height_cm, age, gender, formula='mifflin'):
+    """Basal metabolic rate (kcal/day), 'mifflin' (Mifflin-St Jeor) or 'harris_benedict'."""
+    weight, height, age_ = _array(weight_kg), _array(height_cm), _array(age)
+    male = _is_male(gender)
+    if formula == 'mifflin':
+        base = 10 * weight + 6.25 * height - 5 * age_
+        values = np.where(male, base + 5, base - 161)
+    elif formula == 'harris_benedict':
+        values = np.where(male,
+                          88.36 + 13.4 * weight + 4.8 * height - 5.7 * age_,
+                          447.6 + 9.2 * weight + 3.1 * height - 4.3 * age_)
+    else:
+        raise ValueError(f'unknown BMR formula {formula!r}')
+    return _result(values, weight_kg, height_cm, age, gender)
+
+
+def body_fat(gender, age=None, bmi=None, height_cm=None, neck_cm=None, waist_cm=None, hip_cm=None,
+             formula='deurenberg_whr'):
+    """Body fat percentage.
+
+    'deurenberg' needs bmi and age; 'deurenberg_whr' additionally adjusts by
+    the waist-hip ratio where both are given; 'navy' (US Navy) needs
+    height, neck and waist, plus hip for women.
+    """
+    male = _is_male(gender)
+    if formula in ('deurenberg', 'deurenberg_whr'):
+        values = 1.20 * _array(bmi) + 0.23 * _array(age) + np.where(male, -16.2, -5.4)
+        if formula == 'deurenberg_whr':
+            waist, hip = _array(waist_cm), _array(hip_cm)
+            measured = (waist > 0) & (hip > 0)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                values = values + np.where(measured, (waist / hip - 0.5) * 10, 0)
+    elif formula == 'navy':
+        height, neck, waist = _array(height_cm), _array(neck_cm), _array(waist_cm)
+        hip = np.nan_to_num(_array(hip_cm))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            values = np.where(
+                male,
+                495 / (1.0324 - 0.19077 * np.log10(waist - neck) + 0.15456 * np.log10(height)) - 450,
+                495 / (1.29579 - 0.35004 * np.log10(waist + hip - neck) + 0.22100 * np.log10(height)) - 450,
+            )
+    else:
+        raise ValueError(f'unknown body fat formula {formula!r}')
+    return _result(values, gender, age, bmi, height_cm, neck_cm, waist_cm, hip_cm)
+
+
+# ---------------------------
+# All metrics at once
+# ---------------------------
+def compute(weight_kg, height_cm, age, gender, neck_cm=None, waist_cm=None, hip_cm=None,
+            formulas=DEFAULT_FORMULAS):
+    """{'bmi', 'bmr', 'body_fat'} with one of FORMULA_SETS."""
+    chosen = FORMULA_SETS[formulas]
+    body_mass = bmi(weight_kg, height_cm)
+    return {
+        'bmi': body_mass,
+        'bmr': bmr(weight_kg, height_cm, age, gender, formula=chosen['bmr']),
+        'body_fat': body_fat(gender, age=age, bmi=body_mass, height_cm=height_cm, neck_cm=neck_cm,
+                             waist_cm=waist_cm, hip_cm=hip_cm, formula=chosen['body_fat']),
+    }
+
+
+def compute_frame(users, formulas=DEFAULT_FORMULAS):
+    """bmi/bmr/body_fat DataFrame for a frame with `users` table columns."""
+    optional = {column: users[column] if column in users else None for column in ('neck_cm', 'waist_cm', 'hip_cm')}
+    return pd.DataFrame(compute(users['weight_kg'], users['height_cm'], users['age'], users['gender'],
+                                formulas=formulas, **optional), index=users.index)
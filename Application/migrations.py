@@ -0,0 +1,206 @@
+from datetime import datetime
+
+# ---------------------------
+# Schema migrations
+# ---------------------------
+# Each migration runs once, in order, inside its own transaction, and is
+# recorded in schema_version. Statements are written to be idempotent so a
+# database created by an older build (before schema_version existed) can be
+# brought forward safely. Add new migrations at the end; never edit one that
+# has shipped.
+
+
+def _add_column(conn, table, column, decl):
+    """ALTER TABLE ADD COLUMN unless the column already exists."""
+    existing = {row[1] for row in conn.execute(f'PRAGMA table_info({table})')}
+    if column not in existing:
+        conn.execute(f'ALTER TABLE {table} ADD COLUMN {column} {decl}')
+
+
+def _initial_schema(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT,
+        age INTEGER,
+        gender TEXT,
+        height_cm REAL,
+        weight_kg REAL,
+        target_weight_kg REAL,
+        goal_duration_weeks INTEGER DEFAULT 12,
+        neck_cm REAL,
+        waist_cm REAL,
+        hip_cm REAL,
+        activity_level TEXT,
+        goal TEXT,
+        bmi REAL,
+        bmr REAL,
+        body_fat REAL,
+        created_at TEXT
+    )''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS logs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER,
+        type TEXT,
+        content TEXT,
+        satisfaction INTEGER,
+        calories REAL DEFAULT 0,
+        timestamp TEXT
+    )''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS weight_progress (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER,
+        weight REAL,
+        recorded_at TEXT
+    )''')
+
+
+def _users_goal_columns(conn):
+    # The offline app used to create `users` without the goal columns.
+    _add_column(conn, 'users', 'target_weight_kg', 'REAL')
+    _add_column(conn, 'users', 'goal_duration_weeks', 'INTEGER DEFAULT 12')
+
+
+def _hot_query_indexes(conn):
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_logs_timestamp ON logs (timestamp)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_logs_user_type_ts '
+                 'ON logs (user_id, type, timestamp, calories)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_weight_user_recorded '
+                 'ON weight_progress (user_id, recorded_at, weight)')
+
+
+def _logs_keyset_index(conn):
+    # (user_id, timestamp) plus the implicit rowid serves the (timestamp, id) seek.
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_logs_user_ts ON logs (user_id, timestamp)')
+
+
+# Row deltas a single log contributes to its day's rollup.
+_LOG_DELTAS = '''{sign} (CASE WHEN {row}.type = 'Meal' THEN 1 ELSE 0 END),
+                 {sign} (CASE WHEN {row}.type = 'Exercise' THEN 1 ELSE 0 END),
+                 {sign} (CASE WHEN {row}.type = 'Exercise' THEN COALESCE({row}.calories, 0) ELSE 0 END),
+                 {sign} (CASE WHEN {row}.type = 'Meal' THEN COALESCE({row}.calories, 0) ELSE 0 END)'''
+
+_APPLY_LOG = '''INSERT INTO daily_stats (user_id, day, meals, exercises, exercise_calories, intake_calories)
+                VALUES ({row}.user_id, substr({row}.timestamp, 1, 10), {deltas})
+                ON CONFLICT (user_id, day) DO UPDATE SET
+                    meals = meals + excluded.meals,
+                    exercises = exercises + excluded.exercises,
+                    exercise_calories = exercise_calories + excluded.exercise_calories,
+                    intake_calories = intake_calories + excluded.intake_calories;'''
+
+
+def _daily_stats(conn):
+    # Per-user, per-day rollup of logs kept current by triggers, so charts
+    # read one row per day instead of grouping the whole logs table.
+    conn.execute('''CREATE TABLE IF NOT EXISTS daily_stats (
+        user_id INTEGER NOT NULL,
+        day TEXT NOT NULL,
+        meals INTEGER NOT NULL DEFAULT 0,
+        exercises INTEGER NOT NULL DEFAULT 0,
+        exercise_calories REAL NOT NULL DEFAULT 0,
+        intake_calories REAL NOT NULL DEFAULT 0,
+        PRIMARY KEY (user_id, day)
+    ) WITHOUT ROWID''')
+    add_new = _APPLY_LOG.format(row='NEW', deltas=_LOG_DELTAS.format(sign='', row='NEW'))
+    remove_old = _APPLY_LOG.format(row='OLD', deltas=_LOG_DELTAS.format(sign='-', row='OLD'))
+    conn.execute(f'''CREATE TRIGGER IF NOT EXISTS trg_logs_daily_insert
+                     AFTER INSERT ON logs WHEN NEW.user_id IS NOT NULL AND NEW.timestamp IS NOT NULL
+                     BEGIN {add_new} END''')
+    conn.execute(f'''CREATE TRIGGER IF NOT EXISTS trg_logs_daily_delete
+                     AFTER DELETE ON logs WHEN OLD.user_id IS NOT NULL AND OLD.timestamp IS NOT NULL
+                     BEGIN {remove_old} END''')
+    conn.execute(f'''CREATE TRIGGER IF NOT EXISTS trg_logs_daily_update_old
+                     AFTER UPDATE ON logs WHEN OLD.user_id IS NOT NULL AND OLD.timestamp IS NOT NULL
+                     BEGIN {remove_old} END''')
+    conn.execute(f'''CREATE TRIGGER IF NOT EXISTS trg_logs_daily_update_new
+                     AFTER UPDATE ON logs WHEN NEW.user_id IS NOT NULL AND NEW.timestamp IS NOT NULL
+                     BEGIN {add_new} END''')
+    # Backfill from the logs that already exist.
+    conn.execute('DELETE FROM daily_stats')
+    conn.execute('''INSERT INTO daily_stats (user_id, day, meals, exercises, exercise_calories, intake_calories)
+                    SELECT user_id, substr(timestamp, 1, 10),
+                           SUM(type = 'Meal'), SUM(type = 'Exercise'),
+                           SUM(CASE WHEN type = 'Exercise' THEN COALESCE(calories, 0) ELSE 0 END),
+                           SUM(CASE WHEN type = 'Meal' THEN COALESCE(calories, 0) ELSE 0 END)
+                    FROM logs
+                    WHERE user_id IS NOT NULL AND timestamp IS NOT NULL
+                    GROUP BY user_id, substr(timestamp, 1, 10)''')
+
+
+def _user_recommendations(conn):
+    # Written in bulk by batch_predict.py.
+    conn.execute('''CREATE TABLE IF NOT EXISTS user_recommendations (
+        user_id INTEGER PRIMARY KEY,
+        calorie_intake REAL,
+        main_exercise TEXT,
+        predicted_at TEXT
+    )''')
+
+
+def _job_state(conn):
+    # Checkpoints of background jobs (e.g. retrain.py's training watermark).
+    conn.execute('''CREATE TABLE IF NOT EXISTS job_state (
+        name TEXT PRIMARY KEY,
+        value TEXT,
+        updated_at TEXT
+    )''')
+
+
+def _users_created_at_index(conn):
+    # get_latest_user orders by created_at.
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_users_created_at ON users (created_at)')
+
+
+def _weight_chart_indexes(conn):
+    # Charts order weigh-ins by (recorded_at, id); the old index ended in weight,
+    # so rows sharing a timestamp came back in weight order. (user_id, id) lets
+    # a cached chart look up the newest id and the rows after it with a seek.
+    conn.execute('DROP INDEX IF EXISTS idx_weight_user_recorded')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_weight_user_recorded_id '
+                 'ON weight_progress (user_id, recorded_at, id, weight)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_weight_user_id ON weight_progress (user_id, id)')
+
+
+MIGRATIONS = [
+    (1, 'initial schema', _initial_schema),
+    (2, 'users goal columns', _users_goal_columns),
+    (3, 'hot query indexes', _hot_query_indexes),
+    (4, 'logs keyset index', _logs_keyset_index),
+    (5, 'daily stats rollup', _daily_stats),
+    (6, 'user recommendations', _user_recommendations),
+    (7, 'job state', _job_state),
+    (8, 'users created_at index', _users_created_at_index),
+    (9, 'weight chart indexes', _weight_chart_indexes),
+]
+
+
+def current_version(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS schema_version (
+        version INTEGER PRIMARY KEY,
+        name TEXT,
+        applied_at TEXT
+    )''')
+    return conn.execute('SELECT COALESCE(MAX(version), 0) FROM schema_version').fetchone()[0]
+
+
+def migrate(conn):
+    """Apply every pending migration and return the resulting version."""
+    version = current_version(conn)
+    conn.commit()
+    for number, name, apply in MIGRATIONS:
+        if number <= version:
+            continue
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            # Another process may have migrated while we waited for the lock.
+            if conn.execute('SELECT 1 FROM schema_version WHERE version = ?', (number,)).fetchone():
+                conn.rollback()
+                continue
+            apply(conn)
+            conn.execute('INSERT INTO schema_version (version, name, applied_at) VALUES (?, ?, ?)',
+                         (number, name, datetime.utcnow().isoformat()))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        version = number
+    return version
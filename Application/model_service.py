@@ -0,0 +1,238 @@
+import os
+import threading
+import time
+from functools import lru_cache
+
+import numpy as np
+
+import metrics
+from compiled_forest import CompiledForest
+from features import CALORIE_FEATURES, EXERCISE_FEATURES
+from utils import calculate_avg_burn
+
+# ---------------------------
+# Model files
+# ---------------------------
+# train_models.py writes versioned bundles to models/<version>/ and points
+# models/LATEST at the newest one. Without a bundle, the files written by the
+# standalone training scripts in the working directory are used.
+MODELS_DIR = 'models'
+LATEST_POINTER = os.path.join(MODELS_DIR, 'LATEST')
+
+# Serve the newest bundle of one estimator backend ('forest', 'hgb', see
+# backends.py) instead of the newest overall.
+MODEL_BACKEND = os.environ.get('EATY_MODEL_BACKEND')
+
+CALORIE_MODEL_FILE = 'calorie_intake_model.joblib'
+EXERCISE_MODEL_FILE = 'exercise_model.joblib'
+SEX_ENCODER_FILE = 'sex_label_encoder.joblib'
+EXERCISE_ENCODER_FILE = 'exercise_label_encoder.joblib'
+
+# Flattened exports of the same models; preferred when present because they
+# load via mmap and do not pull scikit-learn into the web process.
+CALORIE_COMPILED_DIR = 'calorie_intake_model'
+EXERCISE_COMPILED_DIR = 'exercise_model'
+
+PREDICTION_CACHE_SIZE = 4096
+RELOAD_CHECK_S = 30   # how often a running app looks for a newer bundle
+
+# Share of the daily intake budgeted to each meal on the /plan page.
+MEAL_SPLIT = {'Breakfast': 0.25, 'Lunch': 0.35, 'Dinner': 0.30, 'Snacks': 0.10}
+
+_models = {}
+_loaded_dir = None
+_next_check = 0.0
+_load_lock = threading.Lock()
+
+
+# ---------------------------
+# Loading
+# ---------------------------
+def model_dir():
+    """Directory holding the current models.
+
+    Raises FileNotFoundError if EATY_MODEL_BACKEND names a backend that has
+    no trained bundle.
+    """
+    pointer = f'{LATEST_POINTER}.{MODEL_BACKEND}' if MODEL_BACKEND else LATEST_POINTER
+    try:
+        with open(pointer) as f:
+            return os.path.join(MODELS_DIR, f.read().strip())
+    except FileNotFoundError:
+        if MODEL_BACKEND:
+            raise
+        return '.'
+
+
+def model_path(name):
+    return os.path.join(model_dir(), name)
+
+
+def load_models():
+    """Load both models and their encoders; returns False (and leaves the
+    service unavailable) if the models have not been trained yet.
+
+    At most every RELOAD_CHECK_S the model pointer is re-read; when it has
+    moved to a new bundle (train_models.py, retrain.py), the new models are
+    swapped in as a whole and the prediction caches are cleared.
+    """
+    global _models, _loaded_dir, _next_check
+    if _models and time.monotonic() < _next_check:
+        return True
+    with _load_lock:
+        if _models and time.monotonic() < _next_check:
+            return True
+        _next_check = time.monotonic() + RELOAD_CHECK_S
+        try:
+            directory = model_dir()
+            if _models and directory == _loaded_dir:
+                return True
+            compiled = (os.path.join(directory, CALORIE_COMPILED_DIR), os.path.join(directory, EXERCISE_COMPILED_DIR))
+            if all(os.path.isdir(path) for path in compiled):
+                loaded = _load_compiled(directory)
+            else:
+                loaded = load_joblib_bundle(directory=directory)
+        except FileNotFoundError:
+            return bool(_models)
+        _models, _loaded_dir = loaded, directory
+        _predict_intake.cache_clear()
+        _predict_exercise.cache_clear()
+    return True
+
+
+def _load_compiled(directory):
+    calorie = CompiledForest(os.path.join(directory, CALORIE_COMPILED_DIR))
+    exercise = CompiledForest(os.path.join(directory, EXERCISE_COMPILED_DIR))
+    return {
+        'calorie': calorie,
+        'exercise': exercise,
+        'sex_classes': calorie.meta['extra']['sex_classes'],
+        'exercise_labels': exercise.labels,
+        'frame': lambda rows, columns: np.asarray(rows, dtype=np.float32),
+    }
+
+
+def load_joblib_bundle(n_jobs=1, directory=None):
+    """Load the scikit-learn models directly (used for large batches, where
+    their compiled tree traversal beats the NumPy predictor)."""
+    import joblib
+    import pandas as pd
+
+    directory = directory or model_dir()
+    calorie = joblib.load(os.path.join(directory, CALORIE_MODEL_FILE))
+    exercise = joblib.load(os.path.join(directory, EXERCISE_MODEL_FILE))
+    # Single-row requests are faster without joblib's thread fan-out.
+    calorie.n_jobs = n_jobs
+    exercise.n_jobs = n_jobs
+    return {
+        'calorie': calorie,
+        'exercise': exercise,
+        'sex_classes': joblib.load(os.path.join(directory, SEX_ENCODER_FILE)).classes_.tolist(),
+        'exercise_labels': joblib.load(os.path.join(directory, EXERCISE_ENCODER_FILE)).classes_.tolist(),
+        'frame': lambda rows, columns: pd.DataFrame(rows, columns=columns),
+    }
+
+
+# ---------------------------
+# Features
+# ---------------------------
+def user_features(user):
+    """Calorie-model feature tuple for a users row (dict), or None when the
+    gender is missing or one the models were not trained on."""
+    if user.get('gender') not in _models['sex_classes']:
+        return None
+    height = user['height_cm']
+    weight = user['weight_kg']
+    target = user.get('target_weight_kg') or weight - 5
+    sex = _models['sex_classes'].index(user['gender'])   # LabelEncoder order
+    return (
+        float(user['age']),
+        sex,
+        float(height),
+        float(weight),
+        float(target),
+        float(user.get('goal_duration_weeks') or 12),
+        float(user.get('bmi') or metrics.bmi(weight, height)),
+        float(metrics.bmi(target, height)),
+        float(calculate_avg_burn(user)),
+    )
+
+
+# ---------------------------
+# Predictions (memoized per feature tuple)
+# ---------------------------
+@lru_cache(maxsize=PREDICTION_CACHE_SIZE)
+def _predict_intake(features):
+    X = _models['frame']([features], CALORIE_FEATURES)
+    return int(round(float(_models['calorie'].predict(X)[0])))
+
+
+@lru_cache(maxsize=PREDICTION_CACHE_SIZE)
+def _predict_exercise(features, intake):
+    X = _models['frame']([features[:-1] + (intake, features[-1])], EXERCISE_FEATURES)
+    code = int(_models['exercise'].predict(X)[0])
+    return _models['exercise_labels'][code]
+
+
+def predict_calorie_intake(user):
+    """Recommended average daily calorie intake (kcal), or None without models
+    or usable features."""
+    if not load_models():
+        return None
+    features = user_features(user)
+    return None if features is None else _predict_intake(features)
+
+
+def recommend_exercise(user):
+    """Recommended main exercise, e.g. 'Cycling 4x/week', or None without models
+    or usable features."""
+    if not load_models():
+        return None
+    features = user_features(user)
+    if features is None:
+        return None
+    return _predict_exercise(features, _predict_intake(features))
+
+
+def cache_info():
+    return {'intake': _predict_intake.cache_info(), 'exercise': _predict_exercise.cache_info()}
+
+
+def daily_plan(user):
+    """Intake, per-meal calorie budget and main exercise for a user, or None
+    (the static plan) without models or with a gender they do not know."""
+    if not load_models():
+        return None
+    features = user_features(user)   # built once for both models
+    if features is None:
+        return None
+    intake = _predict_intake(features)
+    return {
+        'intake': intake,
+        'meals': {meal: int(round(intake * share)) for meal, share in MEAL_SPLIT.items()},
+        'exercise': _predict_exercise(features, intake),
+    }
+
+
+# ---------------------------
+# Batch predictions
+# ---------------------------
+def _bundle(bundle):
+    if bundle is not None:
+        return bundle
+    if not load_models():
+        raise RuntimeError('models have not been trained yet')
+    return _models
+
+
+def predict_intake_batch(X, bundle=None):
+    """Intake predictions for an (n, 9) matrix in CALORIE_FEATURES order."""
+    models = _bundle(bundle)
+    return models['calorie'].predict(models['frame'](X, CALORIE_FEATURES))
+
+
+def recommend_exercise_batch(X, bundle=None):
+    """Exercise labels for an (n, 10) matrix in EXERCISE_FEATURES order."""
+    models = _bundle(bundle)
+    codes = np.asarray(models['exercise'].predict(models['frame'](X, EXERCISE_FEATURES)), dtype=int)
+    return np.asarray(models['exercise_labels'], dtype=object)[codes]
@@ -1,107 +1,50 @@
 from nicegui import ui, app
-import sqlite3
-from datetime import datetime
-import math
 import pandas as pd
 import plotly.express as px
-# ---------------------------
-# Database setup
-# ---------------------------
-conn = sqlite3.connect('fitnessapp.db', check_same_thread=False)
-c = conn.cursor()
-
-# Users table
-c.execute('''CREATE TABLE IF NOT EXISTS users (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    name TEXT,
-    age INTEGER,
-    gender TEXT,
-    height_cm REAL,
-    weight_kg REAL,
-    neck_cm REAL,
-    waist_cm REAL,
-    hip_cm REAL,
-    activity_level TEXT,
-    goal TEXT,
-    bmi REAL,
-    bmr REAL,
-    body_fat REAL,
-    created_at TEXT
-)''')
-
-# Logs table with calories
-c.execute('''CREATE TABLE IF NOT EXISTS logs (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    user_id INTEGER,
-    type TEXT,
-    content TEXT,
-    satisfaction INTEGER,
-    calories REAL DEFAULT 0,
-    timestamp TEXT
-)''')
-conn.commit()
+
+from charts import MAX_CHART_POINTS, cached_figure
+from dbfile import (insert_user, update_user, insert_log, insert_logs_bulk, get_logs, get_latest_user,
+                    get_meals_per_day, get_exercise_calories_per_day, get_user_weight_timeline,
+                    get_log_watermark, get_users_version, get_daily_stats_span)
+from downsample import pick_bucket
+from model_service import daily_plan, load_models
+from metrics import compute as compute_metrics
+from utils import EXERCISE_CALORIES
 
 # ---------------------------
-# Standard calories for exercises
+# Helper functions
 # ---------------------------
-EXERCISE_CALORIES = {
-    'Brisk Walk': 150,
-    'Core Exercises': 100,
-    'Yoga': 80,
-    'Stretching': 50,
-    'Jogging': 200,
-    'Cycling': 250,
-    'Swimming': 300
-}
+# Harris-Benedict BMR and US Navy body fat (see metrics.py).
+FORMULAS = 'harris_navy'
 
 # ---------------------------
-# Helper functions
+# Charts
 # ---------------------------
-def calculate_bmi(weight, height):
-    return round(weight / ((height / 100) ** 2), 2)
+def stats_bucket():
+    """Day, week or month, whichever keeps the log charts within MAX_CHART_POINTS."""
+    first_day, last_day = get_daily_stats_span()
+    return pick_bucket(first_day, last_day, MAX_CHART_POINTS) if first_day else 'day'
 
-def calculate_bmr(weight, height, age, gender):
-    if gender.lower() == 'male':
-        return round(88.36 + 13.4*weight + 4.8*height - 5.7*age, 2)
-    else:
-        return round(447.6 + 9.2*weight + 3.1*height - 4.3*age, 2)
 
-def calculate_body_fat(gender, height, neck, waist, hip):
-    if gender.lower() == 'male':
-        return round(495 / (1.0324 - 0.19077*math.log10(waist - neck) + 0.15456*math.log10(height)) - 450, 2)
-    else:
-        return round(495 / (1.29579 - 0.35004*math.log10(waist + hip - neck) + 0.22100*math.log10(height)) - 450, 2)
-
-def insert_user(data):
-    c.execute('''INSERT INTO users (name, age, gender, height_cm, weight_kg, neck_cm, waist_cm, hip_cm, activity_level, goal, bmi, bmr, body_fat, created_at)
-                 VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''', (
-        data['name'], data['age'], data['gender'], data['height_cm'], data['weight_kg'],
-        data['neck_cm'], data['waist_cm'], data.get('hip_cm'), data['activity_level'],
-        data['goal'], data['bmi'], data['bmr'], data['body_fat'], datetime.utcnow().isoformat()
-    ))
-    conn.commit()
-    return c.lastrowid
-
-def update_user(user_id, data):
-    c.execute('''UPDATE users SET name=?, age=?, gender=?, height_cm=?, weight_kg=?, neck_cm=?, waist_cm=?, hip_cm=?,
-                 activity_level=?, goal=?, bmi=?, bmr=?, body_fat=?, created_at=? WHERE id=?''', (
-        data['name'], data['age'], data['gender'], data['height_cm'], data['weight_kg'],
-        data['neck_cm'], data['waist_cm'], data.get('hip_cm'), data['activity_level'],
-        data['goal'], data['bmi'], data['bmr'], data['body_fat'], datetime.utcnow().isoformat(), user_id
-    ))
-    conn.commit()
-
-def insert_log(user_id, log_type, content, satisfaction, calories=0):
-    c.execute('''INSERT INTO logs (user_id, type, content, satisfaction, calories, timestamp)
-                 VALUES (?, ?, ?, ?, ?, ?)''',
-              (user_id, log_type, content, satisfaction, calories, datetime.utcnow().isoformat()))
-    conn.commit()
-
-def get_logs():
-    c.execute('SELECT * FROM logs ORDER BY timestamp DESC')
-    rows = c.fetchall()
-    col_names = [desc[0] for desc in c.description]
-    return [dict(zip(col_names, row)) for row in rows]
+def meals_figure():
+    meal_data = get_meals_per_day(bucket=stats_bucket())
+    if meal_data:
+        df_meals = pd.DataFrame(meal_data, columns=['Day', 'Meals'])
+        return px.bar(df_meals, x='Day', y='Meals', title='Meals Logged Per Day')
+
+
+def weight_figure():
+    weight_data = get_user_weight_timeline()
+    if weight_data:
+        df_weight = pd.DataFrame(weight_data, columns=['Day', 'Weight'])
+        return px.line(df_weight, x='Day', y='Weight', markers=True, title='Weight Over Time')
+
+
+def calories_figure():
+    calories_data = get_exercise_calories_per_day(bucket=stats_bucket())
+    if calories_data:
+        df_calories = pd.DataFrame(calories_data, columns=['Day', 'Calories'])
+        return px.line(df_calories, x='Day', y='Calories', markers=True, title='Calories Burnt Over Time')
 
 # ---------------------------
 # UI Helper
@@ -117,21 +60,20 @@ def main_page():
     home_button()
     ui.label('🏋️‍♀️ Fitness Tracker — Offline Edition').classes('text-2xl font-bold text-center mt-4')
 
-    c.execute('SELECT * FROM users ORDER BY created_at DESC LIMIT 1')
-    user = c.fetchone()
+    user = get_latest_user()
 
     if user:
         # Summary card
         with ui.card().classes('w-1/2 mx-auto mt-6 p-6'):
             ui.markdown(f"""
-**Name:** {user[1]}  
-**Age:** {user[2]}  
-**Gender:** {user[3]}  
-**Height:** {user[4]} cm  
-**Weight:** {user[5]} kg  
-**BMI:** {user[11]}  
-**BMR:** {user[12]}  
-**Body Fat:** {user[13]}%
+**Name:** {user['name']}  
+**Age:** {user['age']}  
+**Gender:** {user['gender']}  
+**Height:** {user['height_cm']} cm  
+**Weight:** {user['weight_kg']} kg  
+**BMI:** {user['bmi']}  
+**BMR:** {user['bmr']}  
+**Body Fat:** {user['body_fat']}%
             """)
 
         # Buttons
@@ -140,28 +82,22 @@ def main_page():
 
         # Charts row
         with ui.row().classes('w-11/12 mx-auto mt-6 gap-4'):
+            # Figures are only rebuilt when logs / users changed (see charts.py).
+            logs_version = get_log_watermark()[0]
+
             # Meals per day
-            c.execute("SELECT date(timestamp) as day, COUNT(*) FROM logs WHERE type='Meal' GROUP BY day ORDER BY day")
-            meal_data = c.fetchall()
-            if meal_data:
-                df_meals = pd.DataFrame(meal_data, columns=['Day', 'Meals'])
-                fig_meals = px.bar(df_meals, x='Day', y='Meals', title='Meals Logged Per Day')
+            fig_meals = cached_figure('meals', logs_version, meals_figure)
+            if fig_meals:
                 ui.plotly(fig_meals).classes('w-1/3')
 
             # Weight over time
-            c.execute("SELECT date(created_at) as day, weight_kg FROM users ORDER BY created_at")
-            weight_data = c.fetchall()
-            if weight_data:
-                df_weight = pd.DataFrame(weight_data, columns=['Day', 'Weight'])
-                fig_weight = px.line(df_weight, x='Day', y='Weight', markers=True, title='Weight Over Time')
+            fig_weight = cached_figure('weight_timeline', get_users_version(), weight_figure)
+            if fig_weight:
                 ui.plotly(fig_weight).classes('w-1/3')
 
             # Calories burnt chart
-            c.execute("SELECT date(timestamp) as day, SUM(calories) FROM logs WHERE type='Exercise' GROUP BY day ORDER BY day")
-            calories_data = c.fetchall()
-            if calories_data:
-                df_calories = pd.DataFrame(calories_data, columns=['Day', 'Calories'])
-                fig_calories = px.line(df_calories, x='Day', y='Calories', markers=True, title='Calories Burnt Over Time')
+            fig_calories = cached_figure('calories', logs_version, calories_figure)
+            if fig_calories:
                 ui.plotly(fig_calories).classes('w-1/3')
 
     else:
@@ -179,9 +115,8 @@ def main_page():
             goal = ui.select(['Lose Weight', 'Get Fitter'], label='Goal')
 
             def submit_user():
-                bmi = calculate_bmi(weight.value, height.value)
-                bmr = calculate_bmr(weight.value, height.value, age.value, gender.value)
-                body_fat = calculate_body_fat(gender.value, height.value, neck.value, waist.value, hip.value or 0)
+                metrics = compute_metrics(weight.value, height.value, age.value, gender.value,
+                                          neck.value, waist.value, hip.value or 0, formulas=FORMULAS)
 
                 data = {
                     'name': name.value,
@@ -194,13 +129,12 @@ def main_page():
                     'hip_cm': float(hip.value) if hip.value else None,
                     'activity_level': activity.value,
                     'goal': goal.value,
-                    'bmi': bmi,
-                    'bmr': bmr,
-                    'body_fat': body_fat,
+                    **metrics,
                 }
 
                 insert_user(data)
-                ui.notify(f'User {name.value} saved! BMI: {bmi}, BMR: {bmr}, Body Fat: {body_fat}%')
+                ui.notify(f"User {name.value} saved! BMI: {metrics['bmi']}, BMR: {metrics['bmr']}, "
+                          f"Body Fat: {metrics['body_fat']}%")
                 ui.navigate.to('/plan')
 
             ui.button('Save & Continue', on_click=submit_user).classes('w-full bg-blue-500 text-white mt-4')
@@ -217,8 +151,15 @@ def plan_page():
         ui.label('Suggested Daily Routine').classes('text-lg font-semibold')
 
         # Meals
-        ui.label('Meals:')
-        ui.markdown('- Breakfast: Oatmeal with fruit\n- Lunch: Grilled chicken and vegetables\n- Dinner: Light salad or soup\n- Snacks: Nuts, yogurt')
+        user = get_latest_user()
+        plan = daily_plan(user) if user else None
+        if plan:
+            ui.label(f"Meals (about {plan['intake']} kcal per day):")
+            ui.markdown('\n'.join(f'- {meal}: {kcal} kcal' for meal, kcal in plan['meals'].items()))
+            ui.label(f"Recommended main exercise: {plan['exercise']}").classes('font-semibold')
+        else:
+            ui.label('Meals:')
+            ui.markdown('- Breakfast: Oatmeal with fruit\n- Lunch: Grilled chicken and vegetables\n- Dinner: Light salad or soup\n- Snacks: Nuts, yogurt')
 
         # Exercises
         ui.label('Exercises (choose what to do today):')
@@ -227,8 +168,7 @@ def plan_page():
         def save_exercises():
             selected = exercises.value
             if selected:
-                for e in selected:
-                    insert_log(1, 'Exercise', e, 5, EXERCISE_CALORIES[e])
+                insert_logs_bulk([(1, 'Exercise', e, 5, EXERCISE_CALORIES[e]) for e in selected])
                 ui.notify(f"Today's exercises saved: {', '.join(selected)}")
             else:
                 ui.notify("No exercises selected.")
@@ -278,38 +218,36 @@ def change_data_page():
     home_button()
     ui.label('✏️ Change My Data').classes('text-2xl font-bold text-center mt-4')
 
-    c.execute('SELECT * FROM users ORDER BY created_at DESC LIMIT 1')
-    user = c.fetchone()
+    user = get_latest_user()
     if not user:
         ui.label("No user data found.").classes('text-center mt-4')
         ui.button("Go to Main Page", on_click=lambda: ui.navigate.to('/')).classes('w-full mt-4')
         return
 
     with ui.card().classes('w-1/2 mx-auto mt-6 p-6'):
-        name = ui.input('Name', value=user[1])
-        age = ui.number('Age (years)', value=user[2])
-        gender = ui.select(['Male', 'Female'], label='Gender', value=user[3])
-        height = ui.number('Height (cm)', value=user[4])
-        weight = ui.number('Weight (kg)', value=user[5])
-        neck = ui.number('Neck (cm)', value=user[6])
-        waist = ui.number('Waist (cm)', value=user[7])
-        hip = ui.number('Hip (cm, optional)', value=user[8])
-        activity = ui.select(['Sedentary', 'Lightly active', 'Moderately active', 'Very active'], label='Activity level', value=user[9])
-        goal = ui.select(['Lose Weight', 'Get Fitter'], label='Goal', value=user[10])
+        name = ui.input('Name', value=user['name'])
+        age = ui.number('Age (years)', value=user['age'])
+        gender = ui.select(['Male', 'Female'], label='Gender', value=user['gender'])
+        height = ui.number('Height (cm)', value=user['height_cm'])
+        weight = ui.number('Weight (kg)', value=user['weight_kg'])
+        neck = ui.number('Neck (cm)', value=user['neck_cm'])
+        waist = ui.number('Waist (cm)', value=user['waist_cm'])
+        hip = ui.number('Hip (cm, optional)', value=user['hip_cm'])
+        activity = ui.select(['Sedentary', 'Lightly active', 'Moderately active', 'Very active'], label='Activity level', value=user['activity_level'])
+        goal = ui.select(['Lose Weight', 'Get Fitter'], label='Goal', value=user['goal'])
 
         def update_user_data():
-            bmi = calculate_bmi(weight.value, height.value)
-            bmr = calculate_bmr(weight.value, height.value, age.value, gender.value)
-            body_fat = calculate_body_fat(gender.value, height.value, neck.value, waist.value, hip.value or 0)
+            metrics = compute_metrics(weight.value, height.value, age.value, gender.value,
+                                      neck.value, waist.value, hip.value or 0, formulas=FORMULAS)
             data = {
                 'name': name.value, 'age': int(age.value), 'gender': gender.value,
                 'height_cm': float(height.value), 'weight_kg': float(weight.value),
                 'neck_cm': float(neck.value), 'waist_cm': float(waist.value),
                 'hip_cm': float(hip.value) if hip.value else None,
                 'activity_level': activity.value, 'goal': goal.value,
-                'bmi': bmi, 'bmr': bmr, 'body_fat': body_fat
+                **metrics,
             }
-            update_user(user[0], data)
+            update_user(user['id'], data)
             ui.notify('User data updated!')
             ui.navigate.to('/plan')
 
@@ -336,4 +274,5 @@ def logs_page():
 # Run app
 # ---------------------------
 if __name__ in {"__main__", "__mp_main__"}:
+    app.on_startup(load_models)
     ui.run()
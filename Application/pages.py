@@ -2,8 +2,10 @@ from nicegui import ui
 import pandas as pd
 import plotly.express as px
 
-from dbfile import c, insert_log, update_user, get_logs
-from utils import EXERCISE_CALORIES, calculate_bmi, calculate_bmr, calculate_body_fat
+from dbfile import insert_log, insert_logs_bulk, update_user, get_logs, get_latest_user
+from model_service import daily_plan
+from metrics import compute as compute_metrics
+from utils import EXERCISE_CALORIES
 
 
 # ---------------------------
@@ -23,8 +25,15 @@ def plan_page():
 
     with ui.card().classes('w-2/3 mx-auto mt-6 p-6'):
         ui.label('Suggested Daily Routine').classes('text-lg font-semibold')
-        ui.label('Meals:')
-        ui.markdown('- Breakfast: Oatmeal with fruit\n- Lunch: Grilled chicken and vegetables\n- Dinner: Light salad or soup\n- Snacks: Nuts, yogurt')
+        user = get_latest_user()
+        plan = daily_plan(user) if user else None
+        if plan:
+            ui.label(f"Meals (about {plan['intake']} kcal per day):")
+            ui.markdown('\n'.join(f'- {meal}: {kcal} kcal' for meal, kcal in plan['meals'].items()))
+            ui.label(f"Recommended main exercise: {plan['exercise']}").classes('font-semibold')
+        else:
+            ui.label('Meals:')
+            ui.markdown('- Breakfast: Oatmeal with fruit\n- Lunch: Grilled chicken and vegetables\n- Dinner: Light salad or soup\n- Snacks: Nuts, yogurt')
 
         ui.label('Exercises (choose what to do today):')
         exercises = ui.select(list(EXERCISE_CALORIES.keys()), label='Exercises', multiple=True)
@@ -32,8 +41,7 @@ def plan_page():
         def save_exercises():
             selected = exercises.value
             if selected:
-                for e in selected:
-                    insert_log(1, 'Exercise', e, 5, EXERCISE_CALORIES[e])
+                insert_logs_bulk([(1, 'Exercise', e, 5, EXERCISE_CALORIES[e]) for e in selected])
                 ui.notify(f"Today's exercises saved: {', '.join(selected)}")
             else:
                 ui.notify("No exercises selected.")
@@ -81,30 +89,28 @@ def change_data_page():
     home_button()
     ui.label('✏️ Change My Data').classes('text-2xl font-bold text-center mt-4')
 
-    c.execute('SELECT * FROM users ORDER BY created_at DESC LIMIT 1')
-    user = c.fetchone()
+    user = get_latest_user()
     if not user:
         ui.label("No user data found.").classes('text-center mt-4')
         ui.button("Go to Main Page", on_click=lambda: ui.navigate.to('/')).classes('w-full mt-4')
         return
 
     with ui.card().classes('w-1/2 mx-auto mt-6 p-6'):
-        name = ui.input('Name', value=user[1])
-        age = ui.number('Age (years)', value=user[2])
-        gender = ui.select(['Male', 'Female'], label='Gender', value=user[3])
-        height = ui.number('Height (cm)', value=user[4])
-        weight = ui.number('Weight (kg)', value=user[5])
-        neck = ui.number('Neck (cm)', value=user[6])
-        waist = ui.number('Waist (cm)', value=user[7])
-        hip = ui.number('Hip (cm, optional)', value=user[8])
+        name = ui.input('Name', value=user['name'])
+        age = ui.number('Age (years)', value=user['age'])
+        gender = ui.select(['Male', 'Female'], label='Gender', value=user['gender'])
+        height = ui.number('Height (cm)', value=user['height_cm'])
+        weight = ui.number('Weight (kg)', value=user['weight_kg'])
+        neck = ui.number('Neck (cm)', value=user['neck_cm'])
+        waist = ui.number('Waist (cm)', value=user['waist_cm'])
+        hip = ui.number('Hip (cm, optional)', value=user['hip_cm'])
         activity = ui.select(['Sedentary', 'Lightly active', 'Moderately active', 'Very active'],
-                             label='Activity level', value=user[9])
-        goal = ui.select(['Lose Weight', 'Get Fitter'], label='Goal', value=user[10])
+                             label='Activity level', value=user['activity_level'])
+        goal = ui.select(['Lose Weight', 'Get Fitter'], label='Goal', value=user['goal'])
 
         def update_user_data():
-            bmi = calculate_bmi(weight.value, height.value)
-            bmr = calculate_bmr(weight.value, height.value, age.value, gender.value)
-            body_fat = calculate_body_fat(gender.value, height.value, neck.value, waist.value, hip.value or 0)
+            metrics = compute_metrics(weight.value, height.value, age.value, gender.value,
+                                      neck.value, waist.value, hip.value)
 
             data = {
                 'name': name.value, 'age': int(age.value), 'gender': gender.value,
@@ -112,9 +118,9 @@ def change_data_page():
                 'neck_cm': float(neck.value), 'waist_cm': float(waist.value),
                 'hip_cm': float(hip.value) if hip.value else None,
                 'activity_level': activity.value, 'goal': goal.value,
-                'bmi': bmi, 'bmr': bmr, 'body_fat': body_fat
+                **metrics,
             }
-            update_user(user[0], data)
+            update_user(user['id'], data)
             ui.notify('User data updated!')
             ui.navigate.to('/plan')
 
@@ -0,0 +1,250 @@
+# retrain.py
+#
+# Incremental retraining from the app's own logs. Users with logs or weights
+# added since the last run's watermark (job_state 'retrain_watermark') are
+# exported in the CSV's feature schema (dbfile.get_training_examples) and the
+# served models are warm-started: WARM_START_TREES new trees (or boosting
+# iterations) are fitted on those examples plus a replay sample of the CSV,
+# while the existing ones are kept, so each run costs O(new data). After
+# MAX_WARM_STARTS warm starts in a row, the next run retrains from scratch on
+# the CSV plus every live example instead, which bounds model growth; so
+# does a warm start whose held-out error on the CSV test split is more than
+# MAX_REGRESSION worse than after the last full training.
+#
+# Each run writes a new bundle next to train_models.py's and switches
+# models/LATEST atomically; running apps pick it up via model_service.
+#
+#   python retrain.py                # one pass
+#   python retrain.py --every 3600   # background loop at lowered priority
+#   python retrain.py --full         # rebuild on CSV + all live examples
+
+import argparse
+import json
+import os
+import shutil
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import dbfile
+import metrics
+import model_service
+import train_models
+from backends import DEFAULT_BACKEND, make_estimator
+from features import CALORIE_FEATURES, EXERCISE_FEATURES
+
+WATERMARK_KEY = 'retrain_watermark'
+MIN_MEAL_DAYS = 7        # logged meal days before a user becomes a training example
+MIN_NEW_EXAMPLES = 20    # fewer new examples wait for the next run
+WARM_START_TREES = 20
+# New boosting iterations fit the residuals of a few hundred rows; a small
+# step keeps them from overfitting that sample.
+WARM_START_LEARNING_RATE = 0.01
+REPLAY_RATIO = 1.0       # CSV rows replayed per live example
+MAX_WARM_STARTS = 10
+MAX_REGRESSION = 0.05    # relative held-out error increase that forces a full rebuild
+TASKS = ('calorie', 'exercise')
+SEED = 42
+
+
+# ---------------------------
+# Live examples
+# ---------------------------
+def live_examples(user_ids, sex_classes, exercise_labels):
+    """Encoded feature frame (EXERCISE_FEATURES) and exercise codes for users' live data.
+
+    The exercise code is -1 when the user's most frequent exercise log does
+    not name one of the model's exercises.
+    """
+    df = pd.DataFrame.from_records(dbfile.get_training_examples(user_ids),
+                                   columns=dbfile.TRAINING_EXAMPLE_COLUMNS)
+    df = df[df['sex'].isin(sex_classes) & (df['meal_days'] >= MIN_MEAL_DAYS)]
+    df = df.dropna(subset=['age', 'height_cm', 'start_weight_kg', 'avg_calorie_intake'])
+    df = df.assign(
+        sex=df['sex'].map(sex_classes.index),
+        target_weight_kg=df['target_weight_kg'].fillna(df['start_weight_kg'] - 5),
+        duration_weeks=df['duration_weeks'].fillna(12),
+        avg_calorie_burn=df['avg_calorie_burn'].fillna(0),
+    )
+    # The CSV's BMIs have one decimal.
+    df['start_bmi'] = metrics.bmi(df['start_weight_kg'], df['height_cm']).round(1)
+    df['target_bmi'] = metrics.bmi(df['target_weight_kg'], df['height_cm']).round(1)
+
+    # Labels look like 'Cycling 4x/week'; logs just name the exercise.
+    codes = {label.split()[0]: code for code, label in enumerate(exercise_labels)}
+    y_exercise = df['main_exercise'].map(codes).fillna(-1).astype(int).to_numpy()
+    return df[EXERCISE_FEATURES].astype(np.float32).reset_index(drop=True), y_exercise
+
+
+def replay_sample(n, rng):
+    """Indices of `n` CSV training rows, with every exercise class represented."""
+    train_idx = train_models.shared['train_idx']
+    y = train_models.shared['y_exercise'][train_idx]
+    per_class = max(1, int(np.ceil(n / len(np.unique(y)))))
+    picked = [rng.choice(train_idx[y == code], per_class, replace=False) for code in np.unique(y)]
+    return np.concatenate(picked)
+
+
+# ---------------------------
+# Model updates
+# ---------------------------
+def model_size(model):
+    return len(model.estimators_) if hasattr(model, 'estimators_') else model.n_iter_
+
+
+def warm_start(model, X, y):
+    """Fit WARM_START_TREES more trees/iterations on (X, y), keeping the existing ones."""
+    if hasattr(model, 'estimators_'):
+        model.set_params(warm_start=True, n_estimators=len(model.estimators_) + WARM_START_TREES)
+    else:
+        model.set_params(warm_start=True, max_iter=model.n_iter_ + WARM_START_TREES, early_stopping=False,
+                         learning_rate=WARM_START_LEARNING_RATE)
+    model.fit(X, y)
+    return model
+
+
+def _task_xy(task, features, y_exercise):
+    if task == 'calorie':
+        return features[CALORIE_FEATURES], features['avg_calorie_intake'].to_numpy()
+    labelled = y_exercise >= 0
+    return features[labelled], y_exercise[labelled]
+
+
+def _error(task, scores):
+    return scores['mae'] if task == 'calorie' else 1 - scores['accuracy']
+
+
+def regressed(scores, reference):
+    """Tasks whose held-out error grew more than MAX_REGRESSION over `reference`."""
+    return [task for task in scores
+            if _error(task, scores[task]) > _error(task, reference[task]) * (1 + MAX_REGRESSION)]
+
+
+def fit_models(backend, bundle, live, live_exercise, full, seed):
+    """Warm-start `bundle`'s models (or, with `full`, train new ones) on the
+    live examples plus CSV rows; returns (models, held-out metrics)."""
+    features, csv_exercise = train_models.shared['features'], train_models.shared['y_exercise']
+    if full:
+        rows = train_models.shared['train_idx']
+    else:
+        rows = replay_sample(int(len(live) * REPLAY_RATIO), np.random.default_rng(seed))
+    train_features = pd.concat([features.iloc[rows], live], ignore_index=True)
+    train_exercise = np.concatenate([csv_exercise[rows], live_exercise])
+
+    models, scores = {}, {}
+    for task in TASKS:
+        X, y = _task_xy(task, train_features, train_exercise)
+        if full:
+            models[task] = make_estimator(backend, task).fit(X, y)
+        else:
+            models[task] = warm_start(bundle[task], X, y)
+        _, X_test, _, y_test = train_models.task_split(task)
+        scores[task] = train_models.score(task, y_test, models[task].predict(X_test))
+    return models, scores
+
+
+def run_once(full=False):
+    """One retraining pass; returns the new bundle's manifest, or None if there was nothing to do."""
+    parent_dir = model_service.model_dir()
+    try:
+        with open(os.path.join(parent_dir, 'manifest.json')) as f:
+            parent = json.load(f)
+    except FileNotFoundError:
+        raise SystemExit('No model bundle found; run train_models.py first.')
+
+    backend = parent.get('backend', DEFAULT_BACKEND)
+    since = tuple(dbfile.get_job_state(WATERMARK_KEY, (0, 0)))
+    until = tuple(dbfile.get_log_watermark())
+    user_ids = None if full else dbfile.get_changed_users(since, until)
+    if user_ids == []:
+        print('No new logs since the last run.')
+        return None
+
+    start = time.perf_counter()
+    bundle = model_service.load_joblib_bundle(n_jobs=-1, directory=parent_dir)
+    sex_classes, exercise_labels = bundle['sex_classes'], bundle['exercise_labels']
+    live, live_exercise = live_examples(user_ids, sex_classes, exercise_labels)
+    if not full and len(live) < MIN_NEW_EXAMPLES:
+        print(f'{len(live)} new training examples (< {MIN_NEW_EXAMPLES}); waiting for more data.')
+        return None
+
+    train_models.prepare()
+    # Held-out metrics of the last full training; warm starts must stay close.
+    reference = parent.get('reference_metrics') or {task: parent['models'][task]['metrics'] for task in TASKS}
+    warm_starts = parent.get('warm_starts', 0)
+    full = full or warm_starts >= MAX_WARM_STARTS
+    if not full:
+        models, scores = fit_models(backend, bundle, live, live_exercise, False, SEED + until[0])
+        worse = regressed(scores, reference)
+        if worse:
+            print(f"Warm start regressed {', '.join(worse)} on held-out data; rebuilding from scratch.")
+            full = True
+    if full:
+        # Every live example, not just the changed users.
+        live, live_exercise = live_examples(None, sex_classes, exercise_labels)
+        models, scores = fit_models(backend, bundle, live, live_exercise, True, SEED)
+
+    version = f"{datetime.utcnow():%Y%m%dT%H%M%SZ}-{backend}-live{until[0]}"
+    bundle_dir = os.path.join(model_service.MODELS_DIR, version)
+    os.makedirs(bundle_dir)
+    for name in (model_service.SEX_ENCODER_FILE, model_service.EXERCISE_ENCODER_FILE):
+        shutil.copy(os.path.join(parent_dir, name), bundle_dir)
+    for task, model in models.items():
+        X_check = train_models.task_split(task)[1]
+        train_models.save_model(model, task, bundle_dir, X_check, sex_classes, exercise_labels)
+
+    manifest = {
+        **parent,
+        'version': version,
+        'backend': backend,
+        'parent': parent['version'],
+        'created_at': datetime.utcnow().isoformat(),
+        'kind': 'full' if full else 'warm_start',
+        'watermark': {'logs': until[0], 'weight_progress': until[1]},
+        'live_examples': len(live),
+        'warm_starts': 0 if full else warm_starts + 1,
+        'reference_metrics': scores if full else reference,
+        'seconds': round(time.perf_counter() - start, 3),
+    }
+    manifest['models'] = {
+        task: {**parent['models'][task], 'metrics': scores[task], 'size': model_size(models[task])}
+        for task in models
+    }
+    manifest.pop('stages', None)
+    train_models.write_manifest(bundle_dir, manifest)
+    train_models.publish(version, backend)
+    dbfile.set_job_state(WATERMARK_KEY, list(until))
+    return manifest
+
+
+def print_report(manifest):
+    print(f"✅ {manifest['kind']} retrain on {manifest['live_examples']} live examples -> "
+          f"{manifest['version']} in {manifest['seconds']:.1f}s")
+    for task, info in manifest['models'].items():
+        scores = ', '.join(f'{k}={v:.3f}' for k, v in info['metrics'].items())
+        print(f"  {task:<9} {scores}  ({info['size']} trees)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Retrain the models on logs added since the last run')
+    parser.add_argument('--full', action='store_true', help='retrain from scratch on the CSV plus all live examples')
+    parser.add_argument('--every', type=float, help='keep running, one pass every EVERY seconds')
+    args = parser.parse_args()
+    if args.every is None:
+        manifest = run_once(args.full)
+        if manifest:
+            print_report(manifest)
+        return
+
+    os.nice(10)   # stay out of the web process's way
+    while True:
+        manifest = run_once(args.full)
+        if manifest:
+            print_report(manifest)
+        time.sleep(args.every)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,25 @@
+import os
+import sqlite3
+import sys
+
+import pytest
+
+# The app's modules are flat in Application/ and import each other by name.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import dbfile                    # noqa: E402
+from migrations import migrate   # noqa: E402
+
+
+@pytest.fixture
+def fresh_db(tmp_path, monkeypatch):
+    """Point dbfile at a new, fully migrated database in a temp dir."""
+    path = str(tmp_path / 'test.db')
+    conn = sqlite3.connect(path)
+    migrate(conn)
+    conn.close()
+
+    dbfile.close_all()
+    monkeypatch.setattr(dbfile, 'DB_PATH', path)
+    yield path
+    dbfile.close_all()
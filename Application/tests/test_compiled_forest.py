@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
+
+from backends import make_estimator
+from compiled_forest import CompiledForest, check_parity, export_model
+
+FEATURES = ['a', 'b', 'c', 'd']
+
+
+@pytest.fixture
+def data():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(400, len(FEATURES)))
+    y = X[:, 0] * 3 + np.sin(X[:, 1]) - X[:, 2] * X[:, 3] + rng.normal(0, 0.1, len(X))
+    return X, y, np.digitize(y, [-1, 1])
+
+
+def with_missing(X, seed=1):
+    """Copy of `X` with about a tenth of its values set to NaN."""
+    X = X.copy()
+    X[np.random.default_rng(seed).random(X.shape) < 0.1] = np.nan
+    return X
+
+
+def compile_model(model, tmp_path):
+    export_model(model, tmp_path / 'compiled', FEATURES)
+    return CompiledForest(tmp_path / 'compiled')
+
+
+def test_forest_regressor_round_trip(data, tmp_path):
+    X, y, _ = data
+    model = RandomForestRegressor(n_estimators=20, max_depth=8, random_state=0).fit(X, y)
+    compiled = compile_model(model, tmp_path)
+
+    np.testing.assert_allclose(compiled.predict(X), model.predict(X), rtol=1e-9, atol=1e-9)
+    assert check_parity(model, compiled, X) < 1e-9
+
+
+def test_forest_classifier_round_trip(data, tmp_path):
+    X, _, labels = data
+    model = RandomForestClassifier(n_estimators=20, max_depth=8, random_state=0).fit(X, labels)
+    compiled = compile_model(model, tmp_path)
+
+    np.testing.assert_array_equal(compiled.predict(X), model.predict(X))
+    np.testing.assert_allclose(compiled.predict_proba(X), model.predict_proba(X), rtol=1e-9, atol=1e-9)
+    check_parity(model, compiled, X)
+
+
+@pytest.mark.parametrize('train_missing', [True, False])
+def test_hgb_regressor_routes_missing_values(data, tmp_path, train_missing):
+    X, y, _ = data
+    model = make_estimator('hgb', 'calorie', max_iter=30).fit(with_missing(X) if train_missing else X, y)
+    compiled = compile_model(model, tmp_path)
+
+    X_missing = with_missing(X, seed=2)
+    np.testing.assert_allclose(compiled.predict(X_missing), model.predict(X_missing), rtol=1e-9, atol=1e-9)
+    check_parity(model, compiled, X)
+
+
+def test_hgb_classifier_routes_missing_values(data, tmp_path):
+    X, _, labels = data
+    model = make_estimator('hgb', 'exercise', max_iter=30).fit(with_missing(X), labels)
+    compiled = compile_model(model, tmp_path)
+
+    X_missing = with_missing(X, seed=2)
+    np.testing.assert_array_equal(compiled.predict(X_missing), model.predict(X_missing))
+    np.testing.assert_allclose(compiled.predict_proba(X_missing), model.predict_proba(X_missing),
+                               rtol=1e-9, atol=1e-9)
+
+
+def test_forest_routes_missing_values(data, tmp_path):
+    X, y, _ = data
+    model = RandomForestRegressor(n_estimators=20, max_depth=8, random_state=0).fit(with_missing(X), y)
+    compiled = compile_model(model, tmp_path)
+
+    X_missing = with_missing(X, seed=2)
+    np.testing.assert_allclose(compiled.predict(X_missing), model.predict(X_missing), rtol=1e-9, atol=1e-9)
+
+
+def test_export_without_missing_routing_rejects_nan(data, tmp_path):
+    X, y, _ = data
+    model = make_estimator('hgb', 'calorie', max_iter=5).fit(X, y)
+    export_model(model, tmp_path / 'compiled', FEATURES)
+    (tmp_path / 'compiled' / 'missing_left.npy').unlink()
+    compiled = CompiledForest(tmp_path / 'compiled')
+
+    compiled.predict(X)
+    with pytest.raises(ValueError):
+        compiled.predict(with_missing(X))
@@ -0,0 +1,10 @@
+import pytest
+
+import dbfile
+
+
+@pytest.mark.parametrize('name', list(dbfile.HOT_QUERIES))
+def test_hot_query_uses_an_index(fresh_db, name):
+    sql, params = dbfile.HOT_QUERIES[name]
+    plan = dbfile.explain(sql, params)
+    assert dbfile.uses_index(plan), f"{name}: {' | '.join(plan)}"
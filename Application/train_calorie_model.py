@@ -1,33 +1,27 @@
 # train_calorie_model.py
+#
+# Standalone training of the calorie model with backends.DEFAULT_BACKEND;
+# train_models.py trains both models into a versioned bundle for any backend.
 
-import pandas as pd
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import LabelEncoder
-from sklearn.ensemble import RandomForestRegressor
 from sklearn.metrics import mean_absolute_error, r2_score
 import joblib
 
+from backends import DEFAULT_BACKEND, make_estimator
+from compiled_forest import CompiledForest, check_parity, export_model
+from dataset import load_training_data
+from features import CALORIE_FEATURES
+
 # Load dataset
-df = pd.read_csv("weight_loss_training_data.csv")
+df = load_training_data(columns=CALORIE_FEATURES + ["avg_calorie_intake"])
 
 # Encode categorical feature 'sex'
 le_sex = LabelEncoder()
 df["sex"] = le_sex.fit_transform(df["sex"])  # Male=1, Female=0 (typically)
 
 # Define features and target
-X = df[
-    [
-        "age",
-        "sex",
-        "height_cm",
-        "start_weight_kg",
-        "target_weight_kg",
-        "duration_weeks",
-        "start_bmi",
-        "target_bmi",
-        "avg_calorie_burn",
-    ]
-]
+X = df[CALORIE_FEATURES]
 y = df["avg_calorie_intake"]
 
 # Split data
@@ -36,9 +30,7 @@ X_train, X_test, y_train, y_test = train_test_split(
 )
 
 # Initialize and train model
-model = RandomForestRegressor(
-    n_estimators=200, random_state=42, max_depth=12, n_jobs=-1
-)
+model = make_estimator(DEFAULT_BACKEND, "calorie")
 model.fit(X_train, y_train)
 
 # Evaluate model
@@ -55,3 +47,9 @@ joblib.dump(model, "calorie_intake_model.joblib")
 joblib.dump(le_sex, "sex_label_encoder.joblib")
 
 print("✅ Model saved as 'calorie_intake_model.joblib'")
+
+# Export flattened trees for the scikit-learn-free predictor and verify parity
+export_model(model, "calorie_intake_model", X.columns,
+              extra={"sex_classes": le_sex.classes_.tolist()})
+deviation = check_parity(model, CompiledForest("calorie_intake_model"), X_test)
+print(f"✅ Compiled model saved to 'calorie_intake_model/' (max deviation {deviation:.2e})")
@@ -1,14 +1,20 @@
 # train_exercise_model.py
+#
+# Standalone training of the exercise model with backends.DEFAULT_BACKEND;
+# train_models.py trains both models into a versioned bundle for any backend.
 
-import pandas as pd
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import LabelEncoder
-from sklearn.ensemble import RandomForestClassifier
 from sklearn.metrics import accuracy_score, classification_report
 import joblib
 
+from backends import DEFAULT_BACKEND, make_estimator
+from compiled_forest import CompiledForest, check_parity, export_model
+from dataset import load_training_data
+from features import EXERCISE_FEATURES
+
 # Load dataset
-df = pd.read_csv("weight_loss_training_data.csv")
+df = load_training_data(columns=EXERCISE_FEATURES + ["main_exercise"])
 
 # Encode categorical features
 le_sex = LabelEncoder()
@@ -18,20 +24,7 @@ le_exercise = LabelEncoder()
 df["main_exercise"] = le_exercise.fit_transform(df["main_exercise"])
 
 # Define features and target
-X = df[
-    [
-        "age",
-        "sex",
-        "height_cm",
-        "start_weight_kg",
-        "target_weight_kg",
-        "duration_weeks",
-        "start_bmi",
-        "target_bmi",
-        "avg_calorie_intake",
-        "avg_calorie_burn",
-    ]
-]
+X = df[EXERCISE_FEATURES]
 y = df["main_exercise"]
 
 # Split data
@@ -40,9 +33,7 @@ X_train, X_test, y_train, y_test = train_test_split(
 )
 
 # Initialize and train model
-model = RandomForestClassifier(
-    n_estimators=250, random_state=42, max_depth=14, n_jobs=-1
-)
+model = make_estimator(DEFAULT_BACKEND, "exercise")
 model.fit(X_train, y_train)
 
 # Evaluate model
@@ -60,3 +51,9 @@ joblib.dump(le_sex, "sex_label_encoder.joblib")  # can reuse the same one
 joblib.dump(le_exercise, "exercise_label_encoder.joblib")
 
 print("✅ Model saved as 'exercise_model.joblib'")
+
+# Export flattened trees for the scikit-learn-free predictor and verify parity
+export_model(model, "exercise_model", X.columns, labels=le_exercise.classes_.tolist(),
+              extra={"sex_classes": le_sex.classes_.tolist()})
+check_parity(model, CompiledForest("exercise_model"), X_test)
+print("✅ Compiled model saved to 'exercise_model/' (predictions match)")
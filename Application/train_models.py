@@ -0,0 +1,229 @@
+# train_models.py
+#
+# Single training entry point for both models. The CSV is loaded and encoded
+# once, one train/test split is shared, and the calorie-intake regressor and
+# exercise classifier are fitted concurrently in forked worker processes that
+# inherit the feature matrix copy-on-write. The result is a versioned bundle
+#
+#   models/<version>/
+#       calorie_intake_model.joblib   calorie_intake_model/   (compiled export)
+#       exercise_model.joblib         exercise_model/         (compiled export)
+#       sex_label_encoder.joblib      exercise_label_encoder.joblib
+#       manifest.json                 (data hash, params, metrics, timings)
+#
+# and models/LATEST plus models/LATEST.<backend> are switched to it atomically.
+#
+#   python train_models.py [--backend forest|hgb] [--sequential]
+
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+
+import joblib
+import numpy as np
+import sklearn
+from sklearn.metrics import accuracy_score, mean_absolute_error, r2_score
+from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import LabelEncoder
+
+import model_service
+from backends import BACKENDS, DEFAULT_BACKEND, make_estimator, params
+from compiled_forest import CompiledForest, check_parity, export_model
+from dataset import DATA_PATH, file_sha256, load_training_data
+from features import CALORIE_FEATURES, EXERCISE_FEATURES
+
+TEST_SIZE = 0.2
+SPLIT_SEED = 42
+
+# Filled in by prepare() before the workers fork, so they share it.
+shared = {}
+
+
+# ---------------------------
+# Measurement
+# ---------------------------
+def _max_rss_mb():
+    # ru_maxrss is KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+@contextmanager
+def stage(name, report):
+    """Record wall time, traced peak memory and max RSS for a block."""
+    tracemalloc.reset_peak()
+    start = time.perf_counter()
+    yield
+    report[name] = {
+        'seconds': round(time.perf_counter() - start, 3),
+        'traced_peak_mb': round(tracemalloc.get_traced_memory()[1] / 2**20, 1),
+        'max_rss_mb': round(_max_rss_mb(), 1),
+    }
+
+
+# ---------------------------
+# Shared feature matrix
+# ---------------------------
+def prepare():
+    """Load and encode the data once; returns the fitted encoders."""
+    df = load_training_data(columns=EXERCISE_FEATURES + ['main_exercise'])
+    le_sex = LabelEncoder()
+    le_exercise = LabelEncoder()
+    features = df[EXERCISE_FEATURES].copy()
+    features['sex'] = le_sex.fit_transform(df['sex'])
+    features = features.astype(np.float32)
+    y_exercise = le_exercise.fit_transform(df['main_exercise'])
+
+    train_idx, test_idx = train_test_split(np.arange(len(df)), test_size=TEST_SIZE, random_state=SPLIT_SEED)
+    shared.update(features=features, y_exercise=y_exercise, train_idx=train_idx, test_idx=test_idx)
+    return le_sex, le_exercise
+
+
+def task_data(task):
+    """(X, y) for 'calorie' or 'exercise' from the prepared feature matrix."""
+    features = shared['features']
+    if task == 'calorie':
+        return features[CALORIE_FEATURES], features['avg_calorie_intake'].to_numpy()
+    return features[EXERCISE_FEATURES], shared['y_exercise']
+
+
+def task_split(task):
+    """(X_train, X_test, y_train, y_test) on the shared split."""
+    X, y = task_data(task)
+    train_idx, test_idx = shared['train_idx'], shared['test_idx']
+    return X.iloc[train_idx], X.iloc[test_idx], y[train_idx], y[test_idx]
+
+
+def score(task, y_true, y_pred):
+    if task == 'calorie':
+        return {'mae': float(mean_absolute_error(y_true, y_pred)), 'r2': float(r2_score(y_true, y_pred))}
+    return {'accuracy': float(accuracy_score(y_true, y_pred))}
+
+
+def _fit(task, n_jobs, backend, bundle_dir, sex_classes, exercise_labels):
+    """Fit, evaluate, save and export one model (runs in a worker process)."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    X_train, X_test, y_train, y_test = task_split(task)
+    model = make_estimator(backend, task, n_jobs=n_jobs)
+    model.fit(X_train, y_train)
+    fit_seconds = time.perf_counter() - start
+    metrics = score(task, y_test, model.predict(X_test))
+
+    save_model(model, task, bundle_dir, X_test, sex_classes, exercise_labels)
+
+    return task, {
+        'metrics': metrics,
+        'fit_seconds': round(fit_seconds, 3),
+        'seconds': round(time.perf_counter() - start, 3),
+        'traced_peak_mb': round(tracemalloc.get_traced_memory()[1] / 2**20, 1),
+        'max_rss_mb': round(_max_rss_mb(), 1),
+    }
+
+
+# ---------------------------
+# Bundle
+# ---------------------------
+def save_model(model, task, bundle_dir, X_check, sex_classes, exercise_labels):
+    """Write a fitted model as joblib plus compiled export and verify the export on `X_check`."""
+    if task == 'calorie':
+        name, labels = model_service.CALORIE_MODEL_FILE, None
+    else:
+        name, labels = model_service.EXERCISE_MODEL_FILE, exercise_labels
+    joblib.dump(model, os.path.join(bundle_dir, name))
+    compiled_dir = os.path.join(bundle_dir, os.path.splitext(name)[0])
+    export_model(model, compiled_dir, X_check.columns, labels=labels, extra={'sex_classes': sex_classes})
+    check_parity(model, CompiledForest(compiled_dir), X_check)
+
+
+def write_manifest(bundle_dir, manifest):
+    with open(os.path.join(bundle_dir, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+
+def publish(version, backend):
+    """Point models/LATEST and models/LATEST.<backend> at `version` atomically."""
+    for pointer in (f'{model_service.LATEST_POINTER}.{backend}', model_service.LATEST_POINTER):
+        tmp = pointer + '.tmp'
+        with open(tmp, 'w') as f:
+            f.write(version)
+        os.replace(tmp, pointer)
+
+
+def train(backend=DEFAULT_BACKEND, sequential=False):
+    tracemalloc.start()
+    report = {}
+    total = time.perf_counter()
+
+    with stage('load_and_encode', report):
+        data_sha256 = file_sha256(DATA_PATH)
+        le_sex, le_exercise = prepare()
+
+    version = f'{datetime.utcnow():%Y%m%dT%H%M%SZ}-{backend}-{data_sha256[:8]}'
+    bundle_dir = os.path.join(model_service.MODELS_DIR, version)
+    os.makedirs(bundle_dir)
+    joblib.dump(le_sex, os.path.join(bundle_dir, model_service.SEX_ENCODER_FILE))
+    joblib.dump(le_exercise, os.path.join(bundle_dir, model_service.EXERCISE_ENCODER_FILE))
+
+    tasks = ('calorie', 'exercise')
+    fit_args = (backend, bundle_dir, le_sex.classes_.tolist(), le_exercise.classes_.tolist())
+    with stage('train', report):
+        can_fork = 'fork' in multiprocessing.get_all_start_methods()
+        if sequential or not can_fork:
+            results = dict(_fit(task, -1, *fit_args) for task in tasks)
+        else:
+            n_jobs = max(1, (os.cpu_count() or 2) // len(tasks))
+            with ProcessPoolExecutor(len(tasks), mp_context=multiprocessing.get_context('fork')) as pool:
+                futures = [pool.submit(_fit, task, n_jobs, *fit_args) for task in tasks]
+                results = dict(future.result() for future in futures)
+
+    report['total'] = {'seconds': round(time.perf_counter() - total, 3), 'max_rss_mb': round(_max_rss_mb(), 1)}
+    manifest = {
+        'version': version,
+        'backend': backend,
+        'created_at': datetime.utcnow().isoformat(),
+        'data': {'path': DATA_PATH, 'sha256': data_sha256, 'rows': len(shared['features'])},
+        'split': {'test_size': TEST_SIZE, 'random_state': SPLIT_SEED},
+        'sklearn_version': sklearn.__version__,
+        'models': {
+            'calorie': {'file': model_service.CALORIE_MODEL_FILE, 'features': CALORIE_FEATURES,
+                        'params': params(backend, 'calorie'), **results['calorie']},
+            'exercise': {'file': model_service.EXERCISE_MODEL_FILE, 'features': EXERCISE_FEATURES,
+                         'params': params(backend, 'exercise'), 'classes': le_exercise.classes_.tolist(),
+                         **results['exercise']},
+        },
+        'stages': report,
+    }
+    write_manifest(bundle_dir, manifest)
+    publish(version, backend)
+    return manifest
+
+
+def print_report(manifest):
+    print(f"✅ Model bundle {manifest['version']} saved to '{model_service.MODELS_DIR}/'")
+    for task, info in manifest['models'].items():
+        metrics = ', '.join(f'{k}={v:.3f}' for k, v in info['metrics'].items())
+        print(f"  {task:<9} {metrics}  fit {info['fit_seconds']:.1f}s, "
+              f"peak traced {info['traced_peak_mb']} MB, max RSS {info['max_rss_mb']} MB")
+    print('Stages:')
+    for name, info in manifest['stages'].items():
+        extra = f", peak traced {info['traced_peak_mb']} MB" if 'traced_peak_mb' in info else ''
+        print(f"  {name:<16} {info['seconds']:>7.2f}s{extra}, max RSS {info['max_rss_mb']} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Train both models into a versioned bundle')
+    parser.add_argument('--backend', choices=sorted(BACKENDS), default=DEFAULT_BACKEND, help='estimator family')
+    parser.add_argument('--sequential', action='store_true', help='train in this process, one model after the other')
+    args = parser.parse_args()
+    print_report(train(args.backend, sequential=args.sequential))
+
+
+if __name__ == '__main__':
+    main()
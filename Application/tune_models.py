@@ -0,0 +1,219 @@
+# tune_models.py
+#
+# Hyperparameter search for either forest that records serving cost next to
+# accuracy. Candidates are drawn from SEARCH_SPACE and pruned by successive
+# halving: every round scores the survivors with k-fold CV on a growing share
+# of the training rows and keeps the best 1/--factor, with all candidate x
+# fold fits of a round running in parallel. The finalists are refitted on the
+# full training split and measured for
+#
+#   held-out MAE / accuracy, joblib + compiled size on disk, load time,
+#   single-row latency (joblib and compiled, as served by /plan) and batch latency
+#
+# and the ones on the error / single-row latency Pareto frontier are marked.
+#
+#   python tune_models.py calorie --candidates 40 --folds 5 --out tuning_calorie.json
+
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import joblib
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
+from sklearn.experimental import enable_halving_search_cv  # noqa: F401
+from sklearn.model_selection import HalvingRandomSearchCV
+
+import train_models
+from backends import params
+from compiled_forest import CompiledForest, export_model
+
+SEARCH_SPACE = {
+    'n_estimators': [25, 50, 100, 200, 300],
+    'max_depth': [6, 8, 10, 12, 14, 16, None],
+    'min_samples_leaf': [1, 2, 5, 10, 20, 50],
+}
+TASKS = {
+    # estimator, CV scoring, current production params
+    'calorie': (RandomForestRegressor, 'neg_mean_absolute_error', params('forest', 'calorie')),
+    'exercise': (RandomForestClassifier, 'accuracy', params('forest', 'exercise')),
+}
+SEED = 42
+LATENCY_REPEATS = 200
+BATCH_ROWS = 10000
+
+
+# ---------------------------
+# Search
+# ---------------------------
+def search(task, X, y, candidates, folds, factor, n_jobs):
+    """Successive-halving random search; returns the last round's survivors."""
+    estimator_cls, scoring, _ = TASKS[task]
+    halving = HalvingRandomSearchCV(
+        estimator_cls(random_state=SEED, n_jobs=1), SEARCH_SPACE,
+        n_candidates=candidates, factor=factor, cv=folds, scoring=scoring,
+        resource='n_samples', min_resources='exhaust', random_state=SEED, refit=False, n_jobs=n_jobs,
+    )
+    halving.fit(X, y)
+    results = halving.cv_results_
+    last = results['iter'] == results['iter'].max()
+    finalists = [
+        {'params': results['params'][i], 'cv_score': float(results['mean_test_score'][i]),
+         'cv_std': float(results['std_test_score'][i])}
+        for i in np.flatnonzero(last)
+    ]
+    rounds = [
+        {'round': int(r), 'candidates': int(np.sum(results['iter'] == r)),
+         'samples': int(results['n_resources'][np.argmax(results['iter'] == r)])}
+        for r in np.unique(results['iter'])
+    ]
+    return sorted(finalists, key=lambda c: -c['cv_score']), rounds
+
+
+# ---------------------------
+# Serving cost
+# ---------------------------
+def _median_seconds(func, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings))
+
+
+def _dir_size(path):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+def serving_cost(model, X_test, workdir):
+    """Disk size, load time and predict latency of a fitted forest."""
+    joblib_path = os.path.join(workdir, 'model.joblib')
+    compiled_dir = os.path.join(workdir, 'compiled')
+    joblib.dump(model, joblib_path)
+    export_model(model, compiled_dir, X_test.columns)
+
+    start = time.perf_counter()
+    loaded = joblib.load(joblib_path)
+    joblib_load = time.perf_counter() - start
+    start = time.perf_counter()
+    compiled = CompiledForest(compiled_dir)
+    compiled_load = time.perf_counter() - start
+
+    loaded.n_jobs = 1   # model_service serves single rows without fan-out
+    row = X_test.iloc[:1]
+    row_array = row.to_numpy()
+    batch = X_test.iloc[np.arange(BATCH_ROWS) % len(X_test)]
+    loaded.predict(row)   # warm up
+    compiled.predict(row_array)
+    return {
+        'joblib_mb': round(os.path.getsize(joblib_path) / 2**20, 2),
+        'compiled_mb': round(_dir_size(compiled_dir) / 2**20, 2),
+        'joblib_load_ms': round(joblib_load * 1000, 2),
+        'compiled_load_ms': round(compiled_load * 1000, 2),
+        'row_ms': round(_median_seconds(lambda: loaded.predict(row), LATENCY_REPEATS) * 1000, 3),
+        'compiled_row_ms': round(_median_seconds(lambda: compiled.predict(row_array), LATENCY_REPEATS) * 1000, 3),
+        'batch_ms': round(_median_seconds(lambda: loaded.predict(batch), 3) * 1000, 1),
+        'n_nodes': int(len(compiled.feature)),
+    }
+
+
+def evaluate(task, params, X_train, y_train, X_test, y_test):
+    """Refit on the full training split; held-out error plus serving cost."""
+    estimator_cls = TASKS[task][0]
+    model = estimator_cls(**{'random_state': SEED, **params}, n_jobs=-1)
+    start = time.perf_counter()
+    model.fit(X_train, y_train)
+    fit_seconds = time.perf_counter() - start
+    metric = train_models.score(task, y_test, model.predict(X_test))
+    with tempfile.TemporaryDirectory() as workdir:
+        cost = serving_cost(model, X_test, workdir)
+    return {**metric, 'fit_seconds': round(fit_seconds, 2), **cost}
+
+
+def error_of(task, result):
+    return result['mae'] if task == 'calorie' else 1 - result['accuracy']
+
+
+def mark_pareto(task, results):
+    """Flag results no other result beats on both error and compiled single-row latency."""
+    for result in results:
+        result['pareto'] = not any(
+            error_of(task, other) <= error_of(task, result)
+            and other['compiled_row_ms'] <= result['compiled_row_ms']
+            and (error_of(task, other), other['compiled_row_ms']) != (error_of(task, result), result['compiled_row_ms'])
+            for other in results
+        )
+
+
+# ---------------------------
+# Report
+# ---------------------------
+def tune(task, candidates, folds, factor, top, n_jobs):
+    train_models.prepare()
+    X_train, X_test, y_train, y_test = train_models.task_split(task)
+
+    start = time.perf_counter()
+    finalists, rounds = search(task, X_train, y_train, candidates, folds, factor, n_jobs)
+    search_seconds = time.perf_counter() - start
+
+    estimator_cls, _, production = TASKS[task]
+    defaults = estimator_cls().get_params()
+    current = {name: production.get(name, defaults[name]) for name in SEARCH_SPACE}
+    entries = [{'params': current, 'cv_score': None, 'cv_std': None, 'current': True}]
+    entries += [{**c, 'current': False} for c in finalists[:top] if c['params'] != current]
+    results = []
+    for entry in entries:
+        print(f"  evaluating {entry['params']}", flush=True)
+        results.append({**entry, **evaluate(task, entry['params'], X_train, y_train, X_test, y_test)})
+    mark_pareto(task, results)
+    return {
+        'task': task,
+        'search_space': SEARCH_SPACE,
+        'folds': folds,
+        'factor': factor,
+        'rounds': rounds,
+        'search_seconds': round(search_seconds, 1),
+        'results': sorted(results, key=lambda r: error_of(task, r)),
+    }
+
+
+def print_report(report):
+    task = report['task']
+    metric = 'mae' if task == 'calorie' else 'accuracy'
+    print(f"Search: {' -> '.join(str(r['candidates']) for r in report['rounds'])} candidates "
+          f"on {' -> '.join(str(r['samples']) for r in report['rounds'])} rows, {report['search_seconds']}s")
+    print(f"{'n_est':>5} {'depth':>5} {'leaf':>4} {metric:>9} {'MB':>7} {'load ms':>8} "
+          f"{'row ms':>7} {'cmp row':>7} {'batch ms':>8}")
+    for r in report['results']:
+        p = r['params']
+        flags = ('*' if r['pareto'] else ' ') + (' (current)' if r['current'] else '')
+        print(f"{p['n_estimators']:>5} {str(p['max_depth']):>5} {p.get('min_samples_leaf', 1):>4} "
+              f"{r[metric]:>9.3f} {r['compiled_mb']:>7.1f} {r['compiled_load_ms']:>8.1f} "
+              f"{r['row_ms']:>7.2f} {r['compiled_row_ms']:>7.2f} {r['batch_ms']:>8.0f} {flags}")
+    print('* = on the error / compiled single-row latency frontier')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Search forest hyperparameters with serving cost')
+    parser.add_argument('task', choices=sorted(TASKS))
+    parser.add_argument('--candidates', type=int, default=40, help='random candidates in the first round')
+    parser.add_argument('--folds', type=int, default=5, help='cross-validation folds')
+    parser.add_argument('--factor', type=int, default=3, help='keep 1/factor of the candidates per round')
+    parser.add_argument('--top', type=int, default=5, help='finalists to refit and measure')
+    parser.add_argument('--jobs', type=int, default=-1, help='parallel CV fits')
+    parser.add_argument('--out', help='write the full report as JSON')
+    args = parser.parse_args()
+
+    report = tune(args.task, args.candidates, args.folds, args.factor, args.top, args.jobs)
+    print_report(report)
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Report written to '{args.out}'")
+
+
+if __name__ == '__main__':
+    main()